@@ -0,0 +1,52 @@
+"""Simulator and plotting modules, imported on first use.
+
+Importing matplotlib.pyplot (font cache, GUI backend) or a simulator
+takes longer than most short runs, and batch workers often need neither.
+Library modules therefore do `from backends import moose` or
+`from backends import pyplot as plt` and the real import happens the
+first time an attribute is used.
+"""
+import importlib
+
+class LazyModule(object):
+    """Stand-in for the module `name`, imported on first attribute
+    access. A missing module raises ImportError at that point. Its own
+    methods are underscored so they never hide the module's attributes;
+    use available() and loaded() below."""
+    def __init__(self, name):
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+
+    def _load(self):
+        module = self.__dict__["_module"]
+        if module is None:
+            module = importlib.import_module(self.__dict__["_name"])
+            self.__dict__["_module"] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __repr__(self):
+        state = "loaded" if loaded(self) else "not loaded"
+        return "<lazy module %r (%s)>" % (self.__dict__["_name"], state)
+
+def available(lazy):
+    """Whether the module behind the LazyModule `lazy` can be imported."""
+    try:
+        lazy._load()
+    except ImportError:
+        return False
+    return True
+
+def loaded(lazy):
+    """Whether the module behind `lazy` has been imported yet."""
+    return lazy.__dict__["_module"] is not None
+
+moose = LazyModule("moose")
+pyplot = LazyModule("matplotlib.pyplot")
+#: NEURON's hoc interpreter; import neuron.gui separately when needed
+neuron = LazyModule("neuron")
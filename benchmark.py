@@ -0,0 +1,253 @@
+"""Benchmarks over model size, channel set and simulated duration.
+
+Every case is built and run in a fresh worker process (see sweep.py), so
+its peak RSS is its own. For each case we record the build time with
+an empty cache, the build time from the cache, the run time, the peak
+RSS and the run time per compartment per step. A set
+of results is saved as JSON under .benchmarks/, named after the current
+commit, and two sets can be compared:
+
+    python benchmark.py                      # run and save
+    python benchmark.py --quick --compare abc1234
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+
+import cable
+import cache
+import channels
+import modelspec
+import morphology
+import profiling
+import sweep
+from backends import moose
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(HERE, ".benchmarks")
+SWC_FILE = os.path.join(HERE, "538ser3sl5-cell1-2-a.CNG.swc")
+
+#: Channel sets: name -> (ChannelSettings, gbar (S/m^2), Ek) as in hw9
+CHANNELS = {
+    "Na":  (channels.Na_settings, 1200, 115e-3 + channels.EREST_ACT),
+    "K":   (channels.K_settings, 360, -12e-3 + channels.EREST_ACT),
+    "KDr": (channels.KDr_settings, 0, -12e-3 + channels.EREST_ACT),
+    "SK":  (channels.SK_settings, 0, -12e-3 + channels.EREST_ACT),
+    "CaL": (channels.CaL_settings, 0, -12e-3 + channels.EREST_ACT),
+}
+CHANNEL_SETS = {
+    "hh":  ("Na", "K"),
+    "hw9": ("Na", "K", "SK", "CaL"),
+    "all": ("Na", "K", "KDr", "SK", "CaL"),
+}
+METRICS = ("build", "cachedBuild", "run", "maxrss", "nsPerCompartmentStep")
+
+#: Passive properties of the SWC cell, as in hw4
+SWC_RM = 2.8
+SWC_RA = 4.0
+SWC_CM = 0.03
+
+def model_spec(number, channelSet):
+    """modelspec dict of `number` hw9 single-compartment neurons with
+    the channels of `channelSet`."""
+    names = CHANNEL_SETS[channelSet]
+    spec = {
+        "name": "bench_%s" % channelSet,
+        "compartments": {
+            "number": number,
+            "diameter": 30e-6,
+            "length": 50e-6,
+            "Em": channels.EREST_ACT + 10.613e-3,
+            "initVm": channels.EREST_ACT,
+            "RM": 1 / (0.3e-3 * 1e4),
+            "CM": 1e-6 * 1e4,
+        },
+        # the constants of channels.py are named <name>_settings
+        "channels": [{"settings": name + "_settings", "gbar": CHANNELS[name][1],
+                "Ek": CHANNELS[name][2]} for name in names],
+    }
+    if any(CHANNELS[name][0].chan_type for name in names):
+        spec["pool"] = "Ca_pool_settings"
+    return spec
+
+def _build_swc(channelSet):
+    cell = cable.from_swc(morphology.read_swc(SWC_FILE), SWC_RM, SWC_RA, SWC_CM)
+    usesCa = False
+    for name in CHANNEL_SETS[channelSet]:
+        settings, gbar, Ek = CHANNELS[name]
+        cell.add_channel(settings, gbar, Ek)
+        usesCa = usesCa or bool(settings.chan_type)
+    if usesCa:
+        cell.add_calcium(channels.Ca_pool_settings)
+    return cell
+
+def _build(model, number, channelSet, simdt, backend):
+    if backend == "engine":
+        if model == "swc":
+            comps = _build_swc(channelSet)
+        else:
+            comps = modelspec.build_engine(
+                    modelspec.compile_spec(model_spec(number, channelSet)))
+        comps.reinit()
+        return comps
+    moose.Neutral("/bench")
+    comps = modelspec.build_moose(
+            modelspec.compile_spec(model_spec(number, channelSet)),
+            "/bench/neuron")
+    for i in range(10):
+        moose.setClock(i, simdt)
+    moose.reinit()
+    return comps
+
+def run_case(model, number, channelSet, duration, simdt, backend):
+    """Build and run one case; returns the METRICS as an array.
+
+    "build" is timed with an empty cache directory, so it does not
+    depend on what earlier runs left there, and "cachedBuild" is a
+    second build read back from that cache, as a new process would.
+    """
+    if backend not in ("engine", "moose"):
+        raise ValueError("unknown backend %r" % (backend,))
+    if backend == "moose" and model == "swc":
+        raise ValueError("the SWC cell is only benchmarked on the engine")
+    cacheDir = cache.CACHE_DIR
+    cache.CACHE_DIR = tempfile.mkdtemp(prefix="benchmark-cache-")
+    try:
+        start = time.time()
+        _build(model, number, channelSet, simdt, backend)
+        build = time.time() - start
+        modelspec.forget()
+        start = time.time()
+        comps = _build(model, number, channelSet, simdt, backend)
+        cachedBuild = time.time() - start
+    finally:
+        shutil.rmtree(cache.CACHE_DIR, ignore_errors=True)
+        cache.CACHE_DIR = cacheDir
+    start = time.time()
+    if backend == "engine":
+        comps.run(duration, simdt, plotdt=duration)
+        count = comps.number
+    else:
+        moose.start(duration)
+        count = len(comps)
+    run = time.time() - start
+    steps = int(round(duration / simdt))
+    return np.array([build, cachedBuild, run, profiling.maxrss(),
+            run / (count * steps) * 1e9])
+
+def cases(quick=False, backend="engine"):
+    """The benchmark grid as a list of run_case parameter dicts."""
+    if quick:
+        numbers, sets, durations = (1, 100), ("hh",), (0.02,)
+    else:
+        numbers, sets, durations = (1, 10, 100, 1000), sorted(CHANNEL_SETS), (0.02, 0.1)
+    points = sweep.grid(("model", ["1comp"]), ("number", numbers),
+            ("channelSet", sets), ("duration", durations))
+    if backend == "engine":
+        points += sweep.grid(("model", ["swc"]), ("number", [1]),
+                ("channelSet", sets), ("duration", durations))
+    for point in points:
+        point["simdt"] = 0.25e-4
+        point["backend"] = backend
+    return points
+
+def run_benchmarks(points, processes=1):
+    """Run every case, one fresh process each, `processes` at a time
+    (more than one makes the timings noisier).
+
+    Returns
+    -------
+    records : list of dict
+        the case parameters plus one entry per metric
+    """
+    results, lengths = sweep.run_sweep(run_case, points, (len(METRICS),), processes)
+    records = []
+    for point, values in zip(points, results):
+        record = dict(point)
+        record.update(zip(METRICS, values.tolist()))
+        records.append(record)
+    return records
+
+def commit():
+    """Short hash of HEAD, with '-dirty' if the tree has changes."""
+    try:
+        head = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                cwd=HERE).decode().strip()
+        dirty = subprocess.call(["git", "diff", "--quiet", "HEAD"], cwd=HERE)
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return head + ("-dirty" if dirty else "")
+
+def save(records, name=None):
+    """Write `records` to .benchmarks/<name>.json (default: the commit)
+    and return the file name."""
+    if name is None:
+        name = commit()
+    if not os.path.isdir(RESULTS_DIR):
+        os.makedirs(RESULTS_DIR)
+    fileName = os.path.join(RESULTS_DIR, name + ".json")
+    with open(fileName, "w") as f:
+        json.dump({"commit": name, "date": time.time(),
+                "python": platform.python_version(), "numpy": np.__version__,
+                "machine": platform.node(), "records": records}, f, indent=2)
+    return fileName
+
+def load(name):
+    """Records saved under `name` (a commit or a file name)."""
+    fileName = name if os.path.exists(name) else os.path.join(RESULTS_DIR, name + ".json")
+    with open(fileName) as f:
+        return json.load(f)["records"]
+
+def _case_key(record):
+    return tuple(record[k] for k in ("backend", "model", "number",
+            "channelSet", "duration", "simdt"))
+
+def compare(old, new, metric="nsPerCompartmentStep", tolerance=0.1):
+    """Cases present in both record lists, with new/old ratio of
+    `metric`; regressions are ratios above 1 + tolerance.
+
+    Returns
+    -------
+    rows : list of (case, old, new, ratio, regressed)
+    """
+    before = dict((_case_key(r), r[metric]) for r in old)
+    rows = []
+    for record in new:
+        key = _case_key(record)
+        if key in before:
+            ratio = record[metric] / before[key]
+            rows.append((key, before[key], record[metric], ratio, ratio > 1 + tolerance))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--quick", action="store_true", help="small grid")
+    parser.add_argument("--backend", default="engine", choices=("engine", "moose"))
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--name", help="save under this name instead of the commit")
+    parser.add_argument("--compare", help="commit or file to compare against")
+    args = parser.parse_args()
+    records = run_benchmarks(cases(args.quick, args.backend), args.processes)
+    print("%-8s %-6s %6s %-4s %6s %9s %9s %9s %9s %12s" % ("backend", "model",
+            "number", "set", "dur", "build(s)", "cached(s)", "run(s)", "rss(MB)",
+            "ns/comp-step"))
+    for r in records:
+        print("%-8s %-6s %6d %-4s %6.3f %9.3f %9.3f %9.3f %9.1f %12.1f" % (r["backend"],
+                r["model"], r["number"], r["channelSet"], r["duration"],
+                r["build"], r.get("cachedBuild", float("nan")), r["run"],
+                r["maxrss"] / 2.0 ** 20, r["nsPerCompartmentStep"]))
+    print("saved " + save(records, args.name))
+    if args.compare:
+        for key, before, after, ratio, regressed in compare(load(args.compare), records):
+            print("%-40s %10.1f %10.1f %6.2fx%s" % (" ".join(map(str, key[1:5])),
+                    before, after, ratio, "  REGRESSION" if regressed else ""))
+
+if __name__ == '__main__':
+    main()
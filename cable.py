@@ -0,0 +1,242 @@
+"""Implicit branched-cable solver for reconstructed morphologies.
+
+The cable equation on a tree of compartments gives a matrix that is
+tridiagonal apart from branch points. With every parent eliminated
+after all of its children (Hines ordering) Gaussian elimination needs
+no fill-in, so each timestep is an O(n) solve. Here the elimination is
+done one tree level at a time, deepest level first, so the Python
+overhead per step scales with the depth of the tree instead of the
+number of compartments.
+"""
+import numpy as np
+
+import hhsim
+import morphology
+from channels import EREST_ACT
+
+def tree_depth(parent):
+    """Distance of every node from its root, by pointer jumping.
+
+    Parameters
+    ----------
+    parent : numpy.ndarray
+        row index of each node's parent, -1 for roots
+    """
+    parent = np.asarray(parent, dtype=np.intp)
+    depth = (parent >= 0).astype(np.intp)
+    anc = parent.copy()
+    active = anc >= 0
+    while active.any():
+        idx = np.nonzero(active)[0]
+        a = anc[idx]
+        depth[idx] += depth[a]
+        anc[idx] = anc[a]
+        active = anc >= 0
+    return depth
+
+def hines_order(parent):
+    """Permutation listing every parent before its children (root
+    first); eliminating in reverse of this order is fill-in free."""
+    return np.argsort(tree_depth(parent), kind="mergesort")
+
+class HinesSolver(object):
+    """Solves the tree-structured system
+
+        diag[i] * V[i] - g[i] * V[parent[i]] - sum_c g[c] * V[c] = rhs[i]
+
+    where g[i] is the axial conductance between node i and its parent
+    and c runs over the children of i.
+
+    Parameters
+    ----------
+    parent : numpy.ndarray
+        row index of each node's parent, -1 for roots
+    g : numpy.ndarray
+        axial conductance to the parent (ignored for roots)
+    """
+    def __init__(self, parent, g):
+        self.parent = np.asarray(parent, dtype=np.intp)
+        n = len(self.parent)
+        self.g = np.where(self.parent >= 0, g, 0.0)
+        depth = tree_depth(self.parent)
+        order = np.argsort(depth, kind="mergesort")
+        bounds = np.searchsorted(depth[order], np.arange(depth.max() + 2))
+        #: nodes of each level, root level first
+        self.levels = [order[bounds[i]:bounds[i + 1]]
+                for i in range(len(bounds) - 1)]
+        # Internally nodes are renumbered level by level, and within a
+        # level by batch (see below), so every batch and every level is
+        # a contiguous slice and only the parents need fancy indexing.
+        batches = [self.levels[0]]
+        for nodes in self.levels[1:]:
+            rank = _rank_within(self.parent[nodes])
+            batches += [nodes[rank == r] for r in range(rank.max() + 1)]
+        #: internal position -> node, and node -> internal position
+        self.order = np.concatenate(batches)
+        self.position = np.empty(n, dtype=np.intp)
+        self.position[self.order] = np.arange(n)
+        starts = np.cumsum([0] + [len(nodes) for nodes in batches])
+        slices = [slice(starts[i], starts[i + 1]) for i in range(len(batches))]
+        parent = np.where(self.parent >= 0, self.position[self.parent], -1)[self.order]
+        g = self.g[self.order]
+        gsum = self.g.copy()
+        np.add.at(gsum, self.parent[self.parent >= 0], self.g[self.parent >= 0])
+        #: preallocated work arrays, in internal order: eliminated
+        #: diagonal, right-hand side, solution and scratch; plus the
+        #: solution in node order, returned when solve gets no `out`
+        self.D = np.empty(n)
+        self.R = np.empty(n)
+        self.X = np.empty(n)
+        self._scratch = np.empty(n)
+        self.V = np.empty(n)
+        #: sum of axial conductances at each node, internal order
+        self.gsum = gsum[self.order]
+        # Everything a step touches is a view of the arrays above made
+        # here once, so a step only runs arithmetic.
+        #: for elimination, deepest first, each non-root level split into
+        #: batches whose parents are all distinct, so fancy-index updates
+        #: do not collide: (D, R of the batch, its parents, g, g*g, scratch)
+        self.batches = [(self.D[sl], self.R[sl], parent[sl], g[sl], g[sl] * g[sl],
+                self._scratch[:sl.stop - sl.start]) for sl in slices[:0:-1]]
+        bounds = np.cumsum([0] + [len(nodes) for nodes in self.levels])
+        #: for back substitution, root level first: (D, R, X of the
+        #: level, its parents, g, scratch)
+        self.forward = []
+        for i in range(1, len(self.levels)):
+            sl = slice(bounds[i], bounds[i + 1])
+            self.forward.append((self.D[sl], self.R[sl], self.X[sl], parent[sl],
+                    g[sl], self._scratch[:sl.stop - sl.start]))
+        self.roots = (self.D[:bounds[1]], self.R[:bounds[1]], self.X[:bounds[1]])
+
+    def solve(self, diag, rhs, out=None):
+        """Solve with the given diagonal (excluding axial terms, which
+        are added here) and right-hand side; returns V.
+
+        Every step works in the arrays allocated by __init__. Without
+        `out` the result is one of them, overwritten by the next solve.
+        """
+        D = self.D
+        R = self.R
+        np.take(diag, self.order, out=D)
+        D += self.gsum
+        np.take(rhs, self.order, out=R)
+        for Di, Ri, par, g, gg, t in self.batches:
+            np.divide(gg, Di, out=t)
+            D[par] -= t
+            np.multiply(g, Ri, out=t)
+            t /= Di
+            R[par] += t
+        Di, Ri, Xi = self.roots
+        np.divide(Ri, Di, out=Xi)
+        X = self.X
+        for Di, Ri, Xi, par, g, t in self.forward:
+            # mode="clip" skips the bounds check that makes take copy
+            X.take(par, out=t, mode="clip")
+            t *= g
+            t += Ri
+            np.divide(t, Di, out=Xi)
+        if out is None:
+            out = self.V
+        out[self.order] = X
+        return out
+
+def _rank_within(keys):
+    """For each entry, how many earlier entries share its key."""
+    order = np.argsort(keys, kind="mergesort")
+    sk = keys[order]
+    start = np.r_[0, np.nonzero(np.diff(sk))[0] + 1]
+    runstart = np.repeat(start, np.diff(np.r_[start, len(sk)]))
+    rank = np.empty(len(keys), dtype=np.intp)
+    rank[order] = np.arange(len(keys)) - runstart
+    return rank
+
+class Cell(hhsim.Compartments):
+    """Branched cell: hhsim.Compartments coupled through axial
+    resistances and advanced with an implicit solve every step.
+
+    Parameters
+    ----------
+    parent : numpy.ndarray
+        row index of each compartment's parent, -1 for the root
+    length, diameter : numpy.ndarray
+        compartment dimensions in meters
+    RM, RA, CM : float
+        specific membrane resistance (ohm*m^2), axial resistance (ohm*m)
+        and membrane capacitance (F/m^2)
+    method : str
+        "be" for backward Euler, "cn" for Crank-Nicolson
+    symmetric : bool
+        couple each compartment to its parent through half of each one's
+        Ra, as GENESIS symcompartments, instead of through its own Ra
+    """
+    def __init__(self, parent, length, diameter, RM, RA, CM,
+            Em=EREST_ACT, initVm=EREST_ACT, method="be", symmetric=False):
+        if method not in ("be", "cn"):
+            raise ValueError("method must be 'be' or 'cn', not %r" % (method,))
+        number = len(parent)
+        hhsim.Compartments.__init__(self, number, diameter, length,
+                Em, initVm, RM, CM)
+        self.parent = np.asarray(parent, dtype=np.intp)
+        self.Rm, self.Cm, self.Ra = morphology.passive_properties(
+                self.length, self.diameter, RM, RA, CM)
+        #: asymmetric compartments, as MOOSE's axial/raxial messages:
+        #: the resistance to the parent is the child's Ra
+        Raxial = self.Ra
+        if symmetric:
+            Raxial = np.where(self.parent >= 0, (self.Ra + self.Ra[self.parent]) / 2.0, self.Ra)
+        self.solver = HinesSolver(self.parent, 1.0 / Raxial)
+        self.symmetric = symmetric
+        self.method = method
+        self._diag = np.empty(number)
+        self._rhs = np.empty(number)
+
+    def update_vm(self, Gk, GkEk, dt):
+        if self.method == "cn":
+            dt = dt / 2.0
+        cdt = self.Cm / dt
+        diag = self._diag
+        rhs = self._rhs
+        np.add(cdt, 1.0 / self.Rm, out=diag)
+        diag += Gk
+        np.multiply(cdt, self.Vm, out=rhs)
+        rhs += self.Em / self.Rm
+        rhs += GkEk
+        rhs += self.inject
+        if self.method == "cn":
+            half = self.solver.solve(diag, rhs)
+            half *= 2.0
+            self.Vm *= -1.0
+            self.Vm += half
+        else:
+            self.solver.solve(diag, rhs, out=self.Vm)
+
+def from_swc(samples, RM, RA, CM, Em=EREST_ACT, initVm=EREST_ACT, method="be",
+        d_lambda=None, frequency=100.0):
+    """Passive Cell from a parsed SWC morphology (see
+    morphology.read_swc): one compartment per sample, or with `d_lambda`
+    the compartments of morphology.discretize, kept as the cell's
+    `compartments` attribute."""
+    if d_lambda is None:
+        length, diameter = morphology.compartment_geometry(samples)
+        return Cell(morphology.parent_indices(samples), length, diameter,
+                RM, RA, CM, Em, initVm, method)
+    comps = morphology.discretize(samples, RM, RA, CM, d_lambda, frequency)
+    cell = Cell(comps.parent, comps.length, comps.diameter,
+            RM, RA, CM, Em, initVm, method)
+    cell.compartments = comps
+    return cell
+
+def from_p(cell, Em=None, initVm=None, method="be"):
+    """Passive Cell from a parsed GENESIS cell file (see
+    morphology.read_p), with RM, RA and CM from its *set_global lines and
+    Em and initVm defaulting to its EREST_ACT."""
+    constants = cell.constants
+    missing = [k for k in ("RM", "RA", "CM") if k not in constants]
+    if missing:
+        raise ValueError("cell file does not set %s" % ", ".join(missing))
+    rest = constants.get("EREST_ACT", EREST_ACT)
+    length, diameter = morphology.compartment_geometry(cell.samples, origin=(0, 0, 0))
+    return Cell(morphology.parent_indices(cell.samples), length, diameter,
+            constants["RM"], constants["RA"], constants["CM"],
+            rest if Em is None else Em, rest if initVm is None else initVm,
+            method, cell.symmetric)
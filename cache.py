@@ -0,0 +1,43 @@
+import hashlib
+import os
+
+#: Directory holding cached arrays. Override with the NEUR634_CACHE
+#: environment variable.
+CACHE_DIR = os.environ.get("NEUR634_CACHE",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"))
+
+def cache_path(kind, key, ext=".npy"):
+    """Return the path of the cache file for `key`, creating the cache
+    directory if needed.
+
+    Parameters
+    ----------
+    kind : str
+        short prefix naming what is cached (e.g. "swc")
+    key : str
+        content hash identifying the cached data
+    ext : str
+        file extension
+    """
+    if not os.path.isdir(CACHE_DIR):
+        try:
+            os.makedirs(CACHE_DIR)
+        except OSError:
+            if not os.path.isdir(CACHE_DIR):
+                raise
+    return os.path.join(CACHE_DIR, "%s-%s%s" % (kind, key, ext))
+
+def digest(*parts):
+    """sha1 hex digest of the repr of `parts`."""
+    return hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()
+
+def bytes_digest(data):
+    return hashlib.sha1(data).hexdigest()
+
+def atomic_save(path, save, *args):
+    """Write a cache file via `save(tmpfile, *args)` then rename, so a
+    crashed or concurrent writer never leaves a half-written file."""
+    tmp = "%s.%d.tmp" % (path, os.getpid())
+    with open(tmp, "wb") as f:
+        save(f, *args)
+    os.rename(tmp, path)
@@ -0,0 +1,98 @@
+import numpy as np
+
+import morphology
+from backends import moose
+
+def compartments(cellPath):
+    """All compartments under `cellPath`, as a moose.vec if the cell was
+    built as one, otherwise as a list of elements."""
+    if moose.element(cellPath).className.endswith("Compartment"):
+        return moose.vec(cellPath)
+    return moose.wildcardFind(cellPath + "/##[ISA=CompartmentBase]")
+
+def set_field(comps, field, values):
+    """Set `field` on every compartment in `comps` from a scalar or an
+    array with one value per compartment. A moose.vec takes the whole
+    array in a single call; a list (cells from moose.loadModel, whose
+    compartments are separate elements) is set element by element."""
+    if isinstance(comps, moose.vec):
+        setattr(comps, field, values)
+        return
+    values = np.broadcast_to(values, (len(comps),))
+    for comp, value in zip(comps, values.tolist()):
+        setattr(comp, field, value)
+
+def set_passive_properties(comps, RM, RA, CM, Em=None, initVm=None,
+        length=None, diameter=None):
+    """Set Rm, Cm and Ra of each compartment from specific membrane
+    constants and that compartment's own geometry.
+
+    Parameters
+    ----------
+    comps : moose.vec or list of moose.Compartment
+        compartments to configure
+    RM, RA, CM : float
+        specific membrane resistance (ohm*m^2), axial resistance (ohm*m)
+        and membrane capacitance (F/m^2)
+    Em, initVm : float, optional
+        leak reversal and initial potential; left unchanged if None
+    length, diameter : numpy.ndarray, optional
+        compartment dimensions in meters (e.g. from
+        morphology.compartment_geometry). Read from `comps` if omitted.
+
+    Returns
+    -------
+    Rm, Cm, Ra : numpy.ndarray
+        the values that were set
+    """
+    if length is None:
+        if isinstance(comps, moose.vec):
+            length = comps.length
+        else:
+            length = [comp.length for comp in comps]
+    if diameter is None:
+        if isinstance(comps, moose.vec):
+            diameter = comps.diameter
+        else:
+            diameter = [comp.diameter for comp in comps]
+    Rm, Cm, Ra = morphology.passive_properties(length, diameter, RM, RA, CM)
+    set_field(comps, "Rm", Rm)
+    set_field(comps, "Cm", Cm)
+    set_field(comps, "Ra", Ra)
+    if Em is not None:
+        set_field(comps, "Em", Em)
+    if initVm is not None:
+        set_field(comps, "initVm", initVm)
+    return Rm, Cm, Ra
+
+def build_cell(samples, cellPath, RM, RA, CM, initVm=None, Em=None, origin=None):
+    """Build a parsed morphology (morphology.read_swc, or
+    morphology.read_p(...).samples with origin=(0, 0, 0)) as one
+    Compartment vec at `cellPath`, element i being sample i.
+
+    Geometry and passive properties are written one array per field,
+    and all parent-child axial connections go in a single SparseMsg.
+    """
+    parent = morphology.parent_indices(samples)
+    length, diameter = morphology.compartment_geometry(samples, origin)
+    comps = moose.vec(cellPath, n=len(samples), dtype="Compartment")
+    comps.length = length
+    comps.diameter = diameter
+    set_passive_properties(comps, RM, RA, CM, Em, initVm, length, diameter)
+    child = np.nonzero(parent >= 0)[0]
+    msg = moose.connect(comps, "axial", comps, "raxial", "Sparse")
+    msg.pairFill(parent[child].tolist(), child.tolist())
+    return comps
+
+# NEURON morphology *.swc file
+def load_neuron_file(fileName, cellPath, RM, RA, CM, initVm=None, Em=None):
+    """Cell of a *.swc file as a Compartment vec (see build_cell), so
+    every field is set with whole arrays instead of per element."""
+    return build_cell(morphology.read_swc(fileName), cellPath, RM, RA, CM,
+            initVm, Em)
+
+def neuron_file_index(fileName):
+    """Row of each named compartment (morphology.compartment_names) in
+    the vec load_neuron_file builds, e.g. cell[index["dend_3_0"]]."""
+    names = morphology.compartment_names(morphology.read_swc(fileName))
+    return dict(zip(names, range(len(names))))
@@ -0,0 +1,425 @@
+import collections
+
+import numpy as np
+
+import cache
+from backends import moose
+
+EREST_ACT = -70e-3 #: Resting membrane potential
+
+
+AbParams = collections.namedtuple("AbParams",[
+    "aRate",    # 'A_A'
+    "aB",       # 'A_B'
+    "aC",       # 'A_C'
+    "aVHalf",   # 'A_D'
+    "aVSlope",  # 'A_F'
+    "bRate",    # 'B_A'
+    "bB",       # 'B_B'
+    "bC",       # 'B_C'
+    "bVHalf",   # 'B_D'
+    "bVSlope"   # 'B_F'
+    ])
+
+#: The parameters for defining m as a function of Vm
+Na_m_params = AbParams(
+      aRate = 1e5 * (25e-3 + EREST_ACT),
+         aB = -1e5,
+         aC = -1.0,
+     aVHalf = -25e-3 - EREST_ACT,
+    aVSlope = -10e-3,
+      bRate = 4e3,
+         bB = 0.0,
+         bC = 0.0,
+     bVHalf = 0.0 - EREST_ACT,
+    bVSlope = 18e-3
+    )
+
+#: Parameters for defining h gate of Na+ channel
+Na_h_params = AbParams(
+      aRate = 70.0,
+         aB = 0.0,
+         aC = 0.0,
+     aVHalf = 0.0 - EREST_ACT,
+    aVSlope = 0.02,
+      bRate = 1000.0,
+         bB = 0.0,
+         bC = 1.0,
+     bVHalf = -30e-3 - EREST_ACT,
+    bVSlope = -0.01
+    )
+
+#: K+ channel in Hodgkin-Huxley model has only one gate, n and these
+#are the parameters for the same
+K_n_params = AbParams(
+      aRate = 1e4 * (10e-3 + EREST_ACT),
+         aB = -1e4,
+         aC = -1.0,
+     aVHalf = -10e-3 - EREST_ACT,
+    aVSlope = -10e-3,
+      bRate = 0.125e3,
+         bB = 0.0,
+         bC = 0.0,
+     bVHalf = 0.0 - EREST_ACT,
+    bVSlope = 80e-3
+    )
+
+KDr_X_params = AbParams(
+      aRate = 28.2,
+         aB = 0,
+         aC = 0.0,
+     aVHalf = 0,
+    aVSlope = -12.5e-3,
+      bRate = 6.78,
+         bB = 0.0,
+         bC = 0.0,
+     bVHalf = 0.0,
+    bVSlope = 33.5e-3
+    )
+
+CaL_X_params = AbParams(
+      aRate = -880,
+         aB = -220e3,
+         aC = -1.0,
+     aVHalf = 4.0003e-3,
+    aVSlope = -7.5e-3,
+      bRate = -284,
+         bB = 71e3,
+         bC = -1.0,
+     bVHalf = -4.0003e-3,
+    bVSlope = 5e-3
+    )
+
+CaDepParams = collections.namedtuple("CaDepParams", [
+    "Kd",
+    "power",
+    "tau"
+    ])
+
+SK_Z_params = CaDepParams(
+       Kd = 0.57e-3,
+    power = 5.2,
+      tau = 4.9e-3
+    )
+
+PoolSettings = collections.namedtuple("PoolSettings", [
+    "CaBasal",
+    "CaThick",
+    "CaTau",
+    "BufCapacity",
+    "name"
+    ])
+
+Ca_pool_settings = PoolSettings(
+        CaBasal = 50e-6,
+        CaThick = 1e-6,
+          CaTau = 20e-3,
+    BufCapacity = 20,
+           name = "CaPool"
+    )
+
+ChannelSettings = collections.namedtuple("ChannelSettings",[
+    "xPower",
+    "yPower",
+    "zPower",
+    "eRev",
+    "name",
+    "xParam",
+    "yParam",
+    "zParam",
+    "chan_type"
+    ])
+
+Na_settings = ChannelSettings(
+       xPower = 3,
+       yPower = 1,
+       zPower = 0,
+         eRev = 0.06,
+         name = "na",
+       xParam = Na_m_params,
+       yParam = Na_h_params,
+       zParam = None,
+    chan_type = ""
+    )
+
+K_settings = ChannelSettings(
+       xPower = 4,
+       yPower = 0,
+       zPower = 0,
+         eRev = -0.1,
+         name = "k",
+       xParam = K_n_params,
+       yParam = None,
+       zParam = None,
+    chan_type = ""
+    )
+
+KDr_settings = ChannelSettings(
+       xPower = 2,
+       yPower = 0,
+       zPower = 0,
+         eRev = 90e-3,
+         name = "kdr",
+       xParam = KDr_X_params,
+       yParam = None,
+       zParam = None,
+    chan_type = ""
+    )
+
+SK_settings = ChannelSettings(
+       xPower = 0,
+       yPower = 0,
+       zPower = 1,
+         eRev = -87e-3,
+         name = "skca",
+       xParam = None,
+       yParam = None,
+       zParam = SK_Z_params,
+    chan_type = "ca_dependent"
+    )
+
+CaL_settings = ChannelSettings(
+       xPower = 1,
+       yPower = 0,
+       zPower = 0,
+         eRev = 130e-3,
+         name = "cal",
+       xParam = CaL_X_params,
+       yParam = None,
+       zParam = None,
+    chan_type = "ca_permeable"
+    )
+
+#: We define the rate parameters, which are functions of Vm as
+#: interpolation tables looked up by membrane potential.
+#: Minimum x-value for the interpolation table
+VMIN = -30e-3 + EREST_ACT
+#: Maximum x-value for the interpolation table
+VMAX = 120e-3 + EREST_ACT
+#: Number of divisions in the interpolation table
+VDIVS = 3000
+
+#: Calcium concentration range (mM) and divisions of Ca-dependent gates
+CAMIN = 0
+CAMAX = 1
+CADIVS = 10000
+#: Bound on the error of the steady state of a Ca-dependent gate read
+#: from its table by linear interpolation; None keeps the CADIVS table
+CA_MAX_ERROR = 1e-4
+
+CaGrid = collections.namedtuple("CaGrid", [
+    "caMin",    # first table point (mM)
+    "caMax",    # last table point (mM); lookups are clamped above it
+    "divs"      # number of uniform divisions
+    ])
+
+#: Below this |denominator| HHGate.setupAlpha averages the two neighbours
+SINGULARITY = 1e-6
+
+def _rate(A, B, C, D, F, v, dv):
+    """y(v) = (A + B * v) / (C + exp((v + D) / F)), evaluated the way
+    HHGate.setupAlpha does it."""
+    if abs(F) < SINGULARITY:
+        return np.zeros_like(v)
+    with np.errstate(over="ignore", divide="ignore", invalid="ignore"):
+        denom = C + np.exp((v + D) / F)
+        y = (A + B * v) / denom
+        bad = np.abs(denom) < SINGULARITY
+        if bad.any():
+            vb = v[bad]
+            hi = (A + B * (vb + dv / 10.0)) / (C + np.exp((vb + dv / 10.0 + D) / F))
+            lo = (A + B * (vb - dv / 10.0)) / (C + np.exp((vb - dv / 10.0 + D) / F))
+            y[bad] = (hi + lo) / 2.0
+    return y
+
+def alpha_tables(params, vDivs=VDIVS, vMin=VMIN, vMax=VMAX):
+    """tableA (alpha) and tableB (alpha + beta) of a voltage gate, the
+    same arrays HHGate.setupAlpha(params + (vDivs, vMin, vMax)) builds.
+
+    Returns
+    -------
+    tableA, tableB : numpy.ndarray
+        vDivs + 1 entries each, spanning vMin..vMax
+    """
+    v = np.linspace(vMin, vMax, vDivs + 1)
+    dv = (vMax - vMin) / float(vDivs)
+    alpha = _rate(params.aRate, params.aB, params.aC, params.aVHalf,
+            params.aVSlope, v, dv)
+    beta = _rate(params.bRate, params.bB, params.bC, params.bVHalf,
+            params.bVSlope, v, dv)
+    return alpha, alpha + beta
+
+def ca_tables(zParam, caDivs=CADIVS, caMin=CAMIN, caMax=CAMAX):
+    """tableA and tableB of a Ca-dependent Z gate with Hill-type steady
+    state and constant tau."""
+    caTerm = (np.linspace(caMin, caMax, caDivs)/zParam.Kd)**zParam.power
+    inf_z = caTerm/(1+caTerm) # open probability at steady state for a given Ca concentration
+    tau_z = zParam.tau*np.ones(caDivs) # constant tau for any Ca concentration
+    return inf_z/tau_z, 1/tau_z
+
+def ca_points(grid):
+    """Concentrations of the divs + 1 entries of a CaGrid table."""
+    return np.linspace(grid.caMin, grid.caMax, grid.divs + 1)
+
+def _ca_rates(zParam, ca):
+    caTerm = (ca/zParam.Kd)**zParam.power
+    inf_z = caTerm/(1+caTerm)
+    tau_z = zParam.tau*np.ones(len(ca))
+    return inf_z/tau_z, 1/tau_z
+
+def _interpolation_error(zParam, grid, oversample=8):
+    """Largest error of the steady state linearly interpolated from the
+    table of `grid`, sampled `oversample` times per division."""
+    points = ca_points(grid)
+    fine = ca_points(grid._replace(divs=grid.divs * oversample))
+    A, B = _ca_rates(zParam, points)
+    fineA, fineB = _ca_rates(zParam, fine)
+    approx = np.interp(fine, points, A / B)
+    return np.abs(approx - fineA / fineB).max()
+
+#: Grids sized by ca_grid in this process
+_grids = {}
+
+def ca_grid(zParam, maxError=CA_MAX_ERROR, caMin=CAMIN, caMax=CAMAX):
+    """Smallest table grid for a Ca-dependent gate whose interpolated
+    steady state is within `maxError` of the exact one.
+
+    The table stops where the steady state is within maxError of 1,
+    since lookups above the last entry are clamped to it. The grid is
+    uniform, as MOOSE's HHGate needs.
+
+    Returns
+    -------
+    grid : CaGrid
+    """
+    key = (tuple(zParam), maxError, caMin, caMax)
+    grid = _grids.get(key)
+    if grid is not None:
+        return grid
+    caSat = zParam.Kd * ((1 - maxError) / maxError) ** (1.0 / zParam.power)
+    top = min(caMax, max(caSat, caMin + zParam.Kd))
+    divs = 16
+    while True:
+        grid = CaGrid(caMin, top, divs)
+        error = _interpolation_error(zParam, grid)
+        if error <= maxError:
+            break
+        # the error of linear interpolation falls as divs**-2
+        divs = int(np.ceil(divs * max(1.1, np.sqrt(error / maxError))))
+    _grids[key] = grid
+    return grid
+
+def channel_ca_grid(channelSettings, caMaxError=CA_MAX_ERROR, caMin=CAMIN,
+        caMax=CAMAX):
+    """ca_grid of a channel's Z gate, or None if it has no Z gate or
+    caMaxError is None (a caDivs table). The defaults are the grid that
+    create_channel_proto and hhsim.Channel use."""
+    if channelSettings.zPower > 0 and caMaxError is not None:
+        return ca_grid(channelSettings.zParam, caMaxError, caMin, caMax)
+    return None
+
+def table_key(channelSettings, vDivs=VDIVS, vMin=VMIN, vMax=VMAX,
+        caDivs=CADIVS, caMin=CAMIN, caMax=CAMAX, caGrid=None):
+    """Content hash identifying the gate tables of a channel."""
+    parts = (tuple(channelSettings), vDivs, vMin, vMax, caDivs, caMin, caMax)
+    if caGrid is not None:
+        parts += (tuple(caGrid),)
+    return cache.digest(*parts)
+
+#: Gate tables computed in this process, by table_key
+_tables = {}
+
+def gate_tables(channelSettings, vDivs=VDIVS, vMin=VMIN, vMax=VMAX,
+        caDivs=CADIVS, caMin=CAMIN, caMax=CAMAX, caGrid=None):
+    """tableA/tableB arrays of every gate of a channel.
+
+    Tables are memoized per process and stored on disk keyed by
+    table_key, so identical settings are only ever computed once. With a
+    `caGrid` (see ca_grid) the Z gate is tabulated on it instead of on
+    caDivs uniform points.
+
+    Returns
+    -------
+    tables : dict
+        maps "X", "Y" and "Z" (for gates with nonzero power) to
+        (tableA, tableB) pairs
+    """
+    key = table_key(channelSettings, vDivs, vMin, vMax, caDivs, caMin, caMax, caGrid)
+    if key in _tables:
+        return _tables[key]
+    path = cache.cache_path("gates", key, ".npz")
+    tables = {}
+    try:
+        with np.load(path) as data:
+            for gate in "XYZ":
+                if gate + "A" in data:
+                    tables[gate] = (data[gate + "A"], data[gate + "B"])
+    except (IOError, OSError, ValueError):
+        if channelSettings.xPower > 0:
+            tables["X"] = alpha_tables(channelSettings.xParam, vDivs, vMin, vMax)
+        if channelSettings.yPower > 0:
+            tables["Y"] = alpha_tables(channelSettings.yParam, vDivs, vMin, vMax)
+        if channelSettings.zPower > 0 and caGrid is not None:
+            tables["Z"] = _ca_rates(channelSettings.zParam, ca_points(caGrid))
+        elif channelSettings.zPower > 0:
+            tables["Z"] = ca_tables(channelSettings.zParam, caDivs, caMin, caMax)
+        arrays = {}
+        for gate, (tableA, tableB) in tables.items():
+            arrays[gate + "A"] = tableA
+            arrays[gate + "B"] = tableB
+        cache.atomic_save(path, lambda f: np.savez(f, **arrays))
+    _tables[key] = tables
+    return tables
+
+#: Prototypes built in this process: /library path -> table_key
+_protos = {}
+
+def create_channel_proto(channelSettings,
+        vDivs  = VDIVS,
+        vMin   = VMIN,
+        vMax   = VMAX,
+        caDivs = CADIVS,
+        caMin  = CAMIN,
+        caMax  = CAMAX,
+        caMaxError = CA_MAX_ERROR):
+    """Return the prototype '/library/<name>' for `channelSettings`.
+
+    The prototype is only (re)built when it does not exist yet or was
+    last built from different settings; the gate tables come from
+    gate_tables rather than setupAlpha. Unless `caMaxError` is None the
+    Z gate gets an interpolated table sized by ca_grid instead of
+    caDivs points over caMin..caMax.
+    """
+    caGrid = channel_ca_grid(channelSettings, caMaxError, caMin, caMax)
+    key = table_key(channelSettings, vDivs, vMin, vMax, caDivs, caMin, caMax, caGrid)
+    path = '/library/' + channelSettings.name
+    if _protos.get(path) == key and moose.exists(path):
+        return moose.element(path)
+    if(not(moose.exists("/library"))):
+        moose.Neutral('/library')
+    tables = gate_tables(channelSettings, vDivs, vMin, vMax, caDivs, caMin, caMax, caGrid)
+    channel = moose.HHChannel(path)
+    channel.tick = -1
+    if(channelSettings.xPower > 0):
+        channel.Xpower = channelSettings.xPower
+        _set_tables(moose.HHGate(channel.path + "/gateX"), tables["X"], vMin, vMax)
+    if(channelSettings.yPower > 0):
+        channel.Ypower = channelSettings.yPower
+        _set_tables(moose.HHGate(channel.path + "/gateY"), tables["Y"], vMin, vMax)
+    if(channelSettings.zPower > 0):
+        channel.Zpower = channelSettings.zPower
+        zGate = moose.HHGate(channel.path + "/gateZ")
+        if caGrid is None:
+            _set_tables(zGate, tables["Z"], caMin, caMax)
+        else:
+            _set_tables(zGate, tables["Z"], caGrid.caMin, caGrid.caMax)
+            zGate.useInterpolation = True
+        channel.useConcentration = True
+    _protos[path] = key
+    return channel
+
+def _set_tables(gate, tables, xMin, xMax):
+    gate.min = xMin
+    gate.max = xMax
+    gate.tableA = tables[0]
+    gate.tableB = tables[1]
@@ -0,0 +1,155 @@
+"""Snapshots of model state, to start runs from rest.
+
+A run from reinit starts every compartment at initVm with its gates at
+their steady state for initVm, and the first part of the run is spent
+settling to the actual resting state (create_1comp_neuron has Em
+10.6 mV above initVm). equilibrate runs that settling period once, saves Vm,
+gate states, calcium and synaptic conductance to an .npz file in the
+cache, and later runs restore it right after reinit.
+
+State is a dict of arrays: "Vm", "Ca", "<channel>/X", "<channel>/Y",
+"<channel>/Z" for HH channels and "<synchan>/X", "<synchan>/Y" for
+synaptic channels.
+"""
+import os
+
+import numpy as np
+
+import cache
+import hhsim
+from backends import moose
+
+def _gates(channel):
+    """(letter, Gate) of every gate of an hhsim.Channel."""
+    settings = channel.settings
+    letters = [l for l, power in (("X", settings.xPower), ("Y", settings.yPower))
+            if power > 0]
+    for letter, gate in zip(letters, channel.gates):
+        yield letter, gate
+    for gate in channel.caGates:
+        yield "Z", gate
+
+def snapshot(comps):
+    """Copy of the state of hhsim compartments."""
+    state = {"Vm": comps.Vm.copy()}
+    if comps.pool is not None:
+        state["Ca"] = comps.pool.Ca.copy()
+    for channel in comps.channels:
+        if isinstance(channel, hhsim.SynChan):
+            state[channel.name + "/X"] = channel.X.copy()
+            state[channel.name + "/Y"] = channel.Y.copy()
+        else:
+            for letter, gate in _gates(channel):
+                state[channel.name + "/" + letter] = gate.state.copy()
+    return state
+
+def _set(target, state, name):
+    if name not in state:
+        raise ValueError("checkpoint has no state for %s" % name)
+    values = state[name]
+    if values.shape != target.shape:
+        raise ValueError("checkpoint state of %s has shape %s, model has %s"
+                % (name, values.shape, target.shape))
+    target[:] = values
+
+def restore(comps, state):
+    """Write `state` into hhsim compartments; call after reinit."""
+    _set(comps.Vm, state, "Vm")
+    if comps.pool is not None:
+        _set(comps.pool.Ca, state, "Ca")
+    for channel in comps.channels:
+        if isinstance(channel, hhsim.SynChan):
+            _set(channel.X, state, channel.name + "/X")
+            _set(channel.Y, state, channel.name + "/Y")
+            channel.Gk = channel.Y * channel.norm
+            channel.Ik = channel.Gk * (channel.Ek - comps.Vm)
+        else:
+            for letter, gate in _gates(channel):
+                _set(gate.state, state, channel.name + "/" + letter)
+            channel.conductance(comps.Vm)
+
+def save(fileName, state):
+    cache.atomic_save(fileName, lambda f: np.savez(f, **state))
+
+def load(fileName):
+    with np.load(fileName) as data:
+        return dict((name, data[name]) for name in data.files)
+
+def equilibrate(comps, settle=0.1, simdt=0.25e-5, key=None):
+    """Reinit `comps`, bring it to rest and return the rest state.
+
+    With a `key` (anything identifying the model, e.g. a modelspec
+    Model.key and the number of replicas) the rest state is cached on
+    disk and the settling run is skipped when it was done before.
+    """
+    fileName = None
+    if key is not None:
+        fileName = cache.cache_path("rest", cache.digest(key, settle, simdt), ".npz")
+        if os.path.exists(fileName):
+            state = load(fileName)
+            comps.reinit()
+            restore(comps, state)
+            return state
+    comps.reinit()
+    comps.run(settle, simdt, plotdt=settle)
+    state = snapshot(comps)
+    if fileName is not None:
+        save(fileName, state)
+    # start over from time zero, so input trains replay from the start
+    comps.reinit()
+    restore(comps, state)
+    return state
+
+#: MOOSE classes and the fields holding their state
+MOOSE_FIELDS = (
+    ("Compartment", ("Vm",)),
+    ("HHChannel", ("X", "Y", "Z")),
+    ("CaConc", ("Ca",)),
+    )
+
+def snapshot_moose(root):
+    """State of every compartment, HH channel and calcium pool under
+    `root`, as parallel "paths", "fields" and "values" arrays.
+
+    The internal state of SynChan is not readable from Python, so
+    synaptic conductances are only checkpointed on the NumPy engine.
+    """
+    paths = []
+    names = []
+    values = []
+    for cls, fields in MOOSE_FIELDS:
+        for el in moose.wildcardFind("%s/##[TYPE=%s]" % (root, cls)):
+            for field in fields:
+                if cls == "HHChannel" and getattr(el, field + "power") == 0:
+                    continue
+                paths.append(el.path)
+                names.append(field)
+                values.append(getattr(el, field))
+    return {"paths": np.array(paths), "fields": np.array(names),
+            "values": np.array(values, dtype=np.float64)}
+
+def restore_moose(state):
+    """Write a snapshot_moose state back; call after moose.reinit()."""
+    for path, field, value in zip(state["paths"], state["fields"], state["values"]):
+        setattr(moose.element(str(path)), str(field), float(value))
+
+def equilibrate_moose(root, settle=0.1, key=None):
+    """MOOSE version of equilibrate, with the clocks already set up.
+    Runs from moose.reinit() and leaves the simulation at rest."""
+    fileName = None
+    if key is not None:
+        fileName = cache.cache_path("moose-rest",
+                cache.digest(key, root, settle, moose.element("/clock").dts), ".npz")
+        if os.path.exists(fileName):
+            state = load(fileName)
+            moose.reinit()
+            restore_moose(state)
+            return state
+    moose.reinit()
+    moose.start(settle)
+    state = snapshot_moose(root)
+    if fileName is not None:
+        save(fileName, state)
+    moose.reinit()
+    restore_moose(state)
+    return state
@@ -5,6 +5,7 @@
 import moose
 import numpy
 import sys
+from helpers import create_pulse
 
 moose.__version__
 
@@ -47,15 +48,7 @@ soma.inject = 0
 def create_compartment(name):
     pass
 
-def create_pulse(pulsename,pulsedelay,pulsewidth,pulselevel,pulsecomp):
-	pulse = moose.PulseGen(pulsename)
-	pulse.delay[0]=pulsedelay
-	pulse.width[0]=pulsewidth
-	pulse.level[0]=pulselevel
-	pulse.level[1]=1e-9
-	pulse.delay[1]=1e9
-	moose.connect(pulse,'output',pulsecomp,'injectMsg')
-pulse = create_pulse('pulse',0,0,0,soma)
+pulse = create_pulse('pulse',0,0,0,soma,secondlevel=1e-9)
 print(moose.showmsg(soma))
 
 def main(*args):
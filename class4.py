@@ -3,7 +3,7 @@
 # Date: September 4, 2018
 
 import moose
-import numpy
+
 
 #moose.__version__
 
@@ -42,36 +42,12 @@ import numpy
 #print(soma.Vm)
 #soma.inject = 0
 
-def create_compartment(name,length,diameter,surfaceArea,xArea,membranceResistivity,axialResistivity,capacitivity): # Em, initVm?
-	newC = moose.Compartment(name)
-	newC.length = length
-	newC.diameter = diameter
-	newC.Em = Em
-	newC.initVm = initVm
-	newC.Rm = resistivity * 1.0 / surfaceArea
-	newC.Cm = capacitivity * surfaceArea
-	newC.Ra = axialResistivity * length * 1.0 / xArea
-
-def create_spherical_compartment(name,length,diameter,membraneResistivity,axialResistivity,capacitivity):
-	surfaceArea = numpy.pi*diameter**2
-	xArea = surfaceArea * 1.0 /4 
-	create_compartment(name,length,diameter,surfaceArea,xArea,membraneResistivity,axialResistivity,capacitivity)
-
-def create_pulse(pulsename,pulsedelay,pulsewidth,pulselevel,pulsecomp):
-	pulse = moose.PulseGen(pulsename)
-	pulse.delay[0]=pulsedelay
-	pulse.width[0]=pulsewidth
-	pulse.level[0]=pulselevel
-	pulse.level[1]=1e-9
-	pulse.delay[1]=1e9
-	moose.connect(pulse,'output',pulsecomp,'injectMsg')
-
 #output = moose.Neutral("/output")
 #neuron = moose.Neutral("/neuron")
 # RA = 4 ohm-meters
 #soma = create_spherical_compartment("neuron/soma",20e-6,20e-6,2,4,10e-3) # -65e-3, -65e-3
 #dend = create_spherical_compartment("neuron/dend",40e-6,8e-6,2,4,10e-3) # -65e-3, -65e-3
-#pulse = create_pulse('pulse',0,0,0,soma)
+#pulse = create_pulse('pulse',0,0,0,soma,secondlevel=1e-9)
 
 #vmtab = moose.Table("/output/somaVm")
 #moose.showfield(vmtab)
@@ -96,8 +72,6 @@ def read_swc_file(filename, parentName):
 	for component in moose.element(parentName).children():
 		pass
 
-import sys
-
 pfile = "layer2.p"
 swcfile = "538ser3sl5-cell1-2-a.CNG.swc"
 container1="cell1"
@@ -116,7 +90,13 @@ moose.showmsg("cell1/soma")
 moose.showmsg("cell2/soma")
 
 #import neuron
-from neuron import h, gui
+import importlib
+import os
+from backends import neuron
+h = neuron.h
+if os.environ.get("DISPLAY"):
+    # the GUI needs a display; batch runs only need h
+    importlib.import_module("neuron.gui")
 
 print("\n\n\n DOING NEURON NOW! \n\n\n")
 
@@ -170,7 +150,7 @@ t_vec.record(h._ref_t)
 h.tstop = 40.0
 h.run()
 
-from matplotlib import pyplot
+from backends import pyplot
 pyplot.figure(figsize=(8,4))
 pyplot.plot(t_vec,v_vec)
 pyplot.xlabel("time (ms)")
@@ -45,181 +45,15 @@
 
 # Code:
 import numpy as np
-import matplotlib.pyplot as plt
 import moose
-import collections
+from helpers import (create_pulse, create_table, plot_tables,
+        create_ca_pool_proto, addChannelToComps)
 
-EREST_ACT = -70e-3 #: Resting membrane potential
-
-
-AbParams = collections.namedtuple("AbParams",[
-    "aRate",
-    "aB",
-    "aC",
-    "aVHalf",
-    "aVSlope",
-    "bRate",
-    "bB",
-    "bC",
-    "bVHalf",
-    "bVSlope"
-    ])
-
-CaDepParams = collections.namedtuple("CaDepParams", [
-    "Kd",
-    "power",
-    "tau"
-    ])
-
-ChannelSettings = collections.namedtuple("ChannelSettings",[
-    "xPower",
-    "yPower",
-    "zPower",
-    "eRev",
-    "name",
-    "xParam",
-    "yParam",
-    "zParam",
-    "chan_type"
-    ])
-
-SK_Z_params=CaDepParams(0.57e-3, 5.2, 4.9e-3)
-
-#: The parameters for defining m as a function of Vm
-Na_m_params = AbParams(
-        1e5 * (25e-3 + EREST_ACT),  # 'A_A':
-        -1e5,                       # 'A_B':
-        -1.0,                       # 'A_C':
-        -25e-3 - EREST_ACT,         # 'A_D':
-        -10e-3,                     # 'A_F':
-        4e3,                        # 'B_A':
-        0.0,                        # 'B_B':
-        0.0,                        # 'B_C':
-        0.0 - EREST_ACT,            # 'B_D':
-        18e-3                       # 'B_F':
-        )
-
-#: Parameters for defining h gate of Na+ channel
-Na_h_params = AbParams(
-        70.0,                        # 'A_A':
-        0.0,                       # 'A_B':
-        0.0,                       # 'A_C':
-        0.0 - EREST_ACT,           # 'A_D':
-        0.02,                     # 'A_F':
-        1000.0,                       # 'B_A':
-        0.0,                       # 'B_B':
-        1.0,                       # 'B_C':
-        -30e-3 - EREST_ACT,        # 'B_D':
-        -0.01                    # 'B_F':
-        )
-
-
-
-#: K+ channel in Hodgkin-Huxley model has only one gate, n and these
-#are the parameters for the same
-K_n_params = AbParams(
-        1e4 * (10e-3 + EREST_ACT),   #  'A_A':
-        -1e4,                      #  'A_B':
-        -1.0,                       #  'A_C':
-        -10e-3 - EREST_ACT,         #  'A_D':
-        -10e-3,                     #  'A_F':
-        0.125e3,                   #  'B_A':
-        0.0,                        #  'B_B':
-        0.0,                        #  'B_C':
-        0.0 - EREST_ACT,            #  'B_D':
-        80e-3                       #  'B_F':
-        )
-
-KDr_X_params = AbParams(
-        28.2,
-        0,
-        0.0,
-        0,
-        -12.5e-3,
-        6.78,
-        0.0,
-        0.0,
-        0.0,
-        33.5e-3)
-
-CaL_X_params = AbParams(
--880,
--220e3,
--1.0,
-4.0003e-3,
--7.5e-3,
--284,
-71e3,
--1.0,
--4.0003e-3,
-5e-3)
-
-PoolSettings = collections.namedtuple("CaParamTuple", [
-"CaBasal",
-"CaThick",
-"CaTau",
-"BufCapacity",
-"name"
-])
-
-Ca_pool_settings = PoolSettings(50e-6, 1e-6, 20e-3, 20, "CaPool")
-
-Na_settings = ChannelSettings(3,1,0,0.06,"na",Na_m_params,Na_h_params,None,"")
-
-K_settings = ChannelSettings(4,0,0,-0.1,"k",K_n_params,None,None,"")
-
-KDr_settings = ChannelSettings(2,0,0,90e-3,"kdr",KDr_X_params,None,None,"")
-
-SK_settings = ChannelSettings(0,0,1,-87e-3,"skca",None,None,SK_Z_params,"ca_dependent")
-
-CaL_settings = ChannelSettings(1,0,0,130e-3,CaL_X_params,None,None,"CaL","ca_permeable")
-
-#: We define the rate parameters, which are functions of Vm as
-#: interpolation tables looked up by membrane potential.
-#: Minimum x-value for the interpolation table
-VMIN = -30e-3 + EREST_ACT
-#: Maximum x-value for the interpolation table
-VMAX = 120e-3 + EREST_ACT
-#: Number of divisions in the interpolation table
-VDIVS = 3000
-
-def create_channel_proto(channelSettings, vDivs = 3000, vMin = -30e-3 + EREST_ACT, vMax = 120e-3 + EREST_ACT, caDivs=10000, caMin=0, caMax=1):
-    if(not(moose.exists("/library"))):
-        moose.Neutral('/library')
-    channel = moose.HHChannel('/library/' + channelSettings.name)
-    channel.tick = -1
-    if(channelSettings.xPower > 0):
-        channel.Xpower = channelSettings.xPower
-        xGate = moose.HHGate(channel.path + "/gateX")
-        xGate.setupAlpha(channelSettings.xParam + (vDivs, vMin, vMax))
-    if(channelSettings.yPower > 0):
-        channel.Ypower = channelSettings.yPower
-        yGate = moose.HHGate(channel.path + "/gateY")
-        yGate.setupAlpha(channelSettings.yParam + (vDivs, vMin, vMax))
-    if(channelSettings.zPower > 0):
-        channel.Zpower = channelSettings.zPower
-        zGate = moose.HHGate(channel.path + "/gateZ")
-        zGate.min = caMin
-        zGate.max = caMax
-        caTerm = (np.linspace(caMin, caMax, caDivs)/channelSettings.zParam.Kd)**channelSettings.zParam.power
-        inf_z=caTerm/(1+caTerm) # open probability at steady state for a given Ca concentration
-        tau_z=channelSettings.zParam.tau*np.ones(caDivs) # constant tau for any Ca concentration
-        zGate.tableA = inf_z/tau_z #alpha
-        zGate.tableB = 1/tau_z #alpha + beta?
-        channel.useConcentration = True
-    return channel
-
-def create_ca_pool_proto(poolSettings):
-    if(not(moose.exists("/library"))):
-        moose.Neutral('/library')
-    pool = moose.CaConc('/library/' + poolSettings.name)
-    pool.CaBasal=poolSettings.CaBasal
-    pool.ceiling=1
-    pool.floor = 0
-    pool.thick = poolSettings.CaThick
-    pool.tau = poolSettings.CaTau
-    return pool
+from channels import (EREST_ACT, Na_settings, K_settings, SK_settings,
+        CaL_settings, Ca_pool_settings)
 
+# In-class exercise: pools for every compartment of a loaded cell, left
+# unfinished. helpers.add_calcium wires pools to a channel vec instead.
 def add_calcium(cellname, poolSettings, chan_name, chan_type, calname):
     FARADAY = 96485.33289
     pool_proto = create_ca_pool_proto(poolSettings)
@@ -235,21 +69,6 @@ def add_calcium(cellname, poolSettings, chan_name, chan_type, calname):
         if chan_type=="ca_permeable":
             m = moose.connect(chan,"IKOut", )
 
-# channelSpecs must be a dictionary with keys:
-#    settings - ChannelSettings instance
-#    gbar - conductance of channel for this component
-#    Ek -
-def addChannelToComps(channelSpecs, comps, number=1):
-    container = comps[0].parent.path
-    protoChannel = create_channel_proto(channelSpecs["settings"])
-    print(container)
-    print(protoChannel)
-    channel = moose.copy(protoChannel, container, channelSpecs["settings"].name+'_{}'.format(comps.name), number)
-    channel.Gbar = channelSpecs["gbar"] * np.pi*comps.length*comps.diameter # is the list unnecessary?
-    channel.Ek = channelSpecs["Ek"]
-    print(moose.showfield(moose.element(channel)))
-    moose.connect(channel, "channel", comps, "channel", "OneToOne")
-
 def create_1comp_neuron(path, number=1):
     """Create single-compartmental neuron with Na+ and K+ channels.
 
@@ -304,25 +123,9 @@ def create_1comp_neuron(path, number=1):
             "Ek" : -12e-3 + EREST_ACT #??
         }]
     for channel in channels:
-        addChannelToComps(channel, comps)
+        addChannelToComps(channel, comps, number, poolSettings=Ca_pool_settings)
     return comps
 
-def create_compartment(name,length,diameter,surfaceArea,xArea,membraneResistivity,axialResistivity,capacitivity,Em,initVm): # Em, initVm?
-	newC = moose.Compartment(name)
-	newC.length = length
-	newC.diameter = diameter
-	newC.Em = Em
-	newC.initVm = initVm
-	newC.Rm = membraneResistivity * 1.0 / surfaceArea
-	newC.Cm = capacitivity * surfaceArea
-	newC.Ra = axialResistivity * length * 1.0 / xArea
-	return newC
-
-def create_spherical_compartment(name,length,diameter,membraneResistivity,axialResistivity,capacitivity,Em,initVm):
-	surfaceArea = np.pi*diameter**2
-	xArea = surfaceArea * 1.0 /4
-	return create_compartment(name,length,diameter,surfaceArea,xArea,membraneResistivity,axialResistivity,capacitivity,Em,initVm)
-
 def addChannels(comp):
         container = comp.parent.path
         nachan = moose.copy(create_na_proto(), container, 'na_{}'.format(comp.name), 1)
@@ -334,31 +137,6 @@ def addChannels(comp):
         kchan.Ek = -12e-3 + EREST_ACT
         moose.connect(kchan, 'channel', comp, 'channel', 'OneToOne')
 
-def create_pulse(pulsename,pulsedelay,pulsewidth,pulselevel,pulsecomp):
-    pulse = moose.PulseGen(pulsename)
-    pulse.delay[0]=pulsedelay
-    pulse.width[0]=pulsewidth
-    pulse.level[0]=pulselevel
-    pulse.delay[1]=1e9
-    moose.connect(pulse,"output",pulsecomp,"injectMsg")
-    return pulse
-
-def create_table(tablename, tablecomp, compproperty):
-    tab = moose.Table(tablename)
-    moose.connect(tab,"requestOut",tablecomp,compproperty)
-    return tab
-
-def plot_table(table):
-    plot_tables([table])
-
-def plot_tables(tables):
-    #pyplot.clf() # clear figure
-    for table in tables:
-        x = np.fromiter((i*table.dt for i in range(table.size)), float, table.size)
-        y = table.vector
-        plt.plot(x, y)
-    plt.show()
-
 def current_step_test(simtime, simdt, plotdt):
     """
     Create a single compartment and set it up for applying a step
@@ -432,7 +210,7 @@ closing or opening.
     simdt = 0.25e-5
     plotdt = 0.25e-3
     ts, current, vm = current_step_test(simtime, simdt, plotdt)
-    plot_tables([vm, current])
+    plot_tables([vm, current], show=True)
 
 if __name__ == '__main__':
     main()
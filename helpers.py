@@ -0,0 +1,229 @@
+"""MOOSE helpers shared by the class and homework scripts.
+
+These used to be copied into every script. They are kept here once, with
+the signatures the scripts call them with, so a fix or speed-up applies
+to every exercise. Run this module to time each helper.
+"""
+import time
+
+import numpy as np
+
+import cells
+import channels
+import plotting
+from backends import moose
+from hhsim import FARADAY
+
+def create_compartment(name, length, diameter, surfaceArea, xArea,
+        membraneResistivity, axialResistivity, capacitivity, Em=None, initVm=None):
+    """Compartment `name` with passive properties from specific
+    resistivities and capacitance; Em and initVm are left at MOOSE's
+    defaults unless given."""
+    newC = moose.Compartment(name)
+    newC.length = length
+    newC.diameter = diameter
+    if Em is not None:
+        newC.Em = Em
+    if initVm is not None:
+        newC.initVm = initVm
+    newC.Rm = float(membraneResistivity) / surfaceArea
+    newC.Cm = capacitivity * surfaceArea
+    newC.Ra = float(axialResistivity * length) / xArea
+    return newC
+
+def create_spherical_compartment(name, length, diameter, membraneResistivity,
+        axialResistivity, capacitivity, Em=None, initVm=None):
+    surfaceArea = np.pi*diameter**2
+    xArea = float(surfaceArea) / 4
+    return create_compartment(name, length, diameter, surfaceArea, xArea,
+            membraneResistivity, axialResistivity, capacitivity, Em, initVm)
+
+def create_pulse(pulsename, pulsedelay, pulsewidth, pulselevel, pulsecomp,
+        secondlevel=None):
+    """Single current pulse into `pulsecomp`; the second pulse is pushed
+    out to 1e9 s, with its level set to `secondlevel` if given (class2-4
+    set 1e-9)."""
+    pulse = moose.PulseGen(pulsename)
+    pulse.delay[0] = pulsedelay
+    pulse.width[0] = pulsewidth
+    pulse.level[0] = pulselevel
+    if secondlevel is not None:
+        pulse.level[1] = secondlevel
+    pulse.delay[1] = 1e9
+    moose.connect(pulse, "output", pulsecomp, "injectMsg")
+    return pulse
+
+def create_table(tablename, tablecomp, compproperty):
+    tab = moose.Table(tablename)
+    moose.connect(tab, "requestOut", tablecomp, compproperty)
+    return tab
+
+def create_tables(tablename, comps, compproperty):
+    """One table per element of the vec `comps`, as a Table vec with a
+    single OneToOne message instead of one create_table call each."""
+    tabs = moose.vec(tablename, n=len(comps), dtype="Table")
+    moose.connect(tabs, "requestOut", comps, compproperty, "OneToOne")
+    return tabs
+
+def create_spike_table(tablename, spike):
+    tab = moose.Table(tablename)
+    moose.connect(spike, "spikeOut", tab, "spike")
+    return tab
+
+def plot_table(table, show=False, clear=False):
+    return plot_tables([table], show, clear)
+
+def plot_tables(tables, show=False, clear=False):
+    """Plot `tables` into the current figure, emptied first with `clear`;
+    the figure is only shown with `show`, so scripts can draw several
+    and show them together."""
+    return plotting.plot_tables(tables, show=show, clear=clear)
+
+def plot_spike_tables(tables, show=False, clear=False):
+    return plotting.plot_spike_tables(tables, show=show, clear=clear)
+
+def create_channel_proto(channelSettings,
+        vDivs  = channels.VDIVS,
+        vMin   = channels.VMIN,
+        vMax   = channels.VMAX,
+        caDivs = channels.CADIVS,
+        caMin  = channels.CAMIN,
+        caMax  = channels.CAMAX,
+        caMaxError = channels.CA_MAX_ERROR):
+    # built once per process from tables cached on disk, see channels.py
+    return channels.create_channel_proto(channelSettings,
+            vDivs, vMin, vMax, caDivs, caMin, caMax, caMaxError)
+
+#: Pool prototypes built in this process: /library path -> settings
+_pools = {}
+
+def create_ca_pool_proto(poolSettings):
+    path = '/library/' + poolSettings.name
+    if _pools.get(path) == tuple(poolSettings) and moose.exists(path):
+        return moose.element(path)
+    if(not(moose.exists("/library"))):
+        moose.Neutral('/library')
+    pool = moose.CaConc(path)
+    pool.CaBasal = poolSettings.CaBasal
+    pool.ceiling = 1
+    pool.floor = 0
+    pool.thick = poolSettings.CaThick
+    pool.tau = poolSettings.CaTau
+    _pools[path] = tuple(poolSettings)
+    return pool
+
+def create_ca_pools(comps, poolSettings):
+    """CaConc pools for every compartment of the vec `comps`, as one
+    vec next to it, with volume and B computed as arrays. Returns the
+    existing vec if the pools were already made."""
+    path = "%s/%s_%s" % (comps[0].parent.path, poolSettings.name, comps.name)
+    if moose.exists(path):
+        return moose.vec(path)
+    pools = moose.vec(path, n=len(comps), dtype="CaConc")
+    length = np.asarray(comps.length, dtype=np.float64)
+    diameter = np.asarray(comps.diameter, dtype=np.float64)
+    thick = np.full(len(comps), poolSettings.CaThick)
+    vol = np.pi*length*diameter*thick
+    pools.CaBasal = poolSettings.CaBasal
+    pools.ceiling = 1
+    pools.floor = 0
+    pools.tau = poolSettings.CaTau
+    pools.length = length
+    pools.diameter = diameter
+    pools.thick = thick
+    pools.B = 1/(FARADAY*vol*2)/poolSettings.BufCapacity
+    return pools
+
+def add_calcium(comps, poolSettings, channel, chan_type):
+    """Connect the channel vec `channel` on `comps` to their calcium
+    pools (made by create_ca_pools if needed) with one OneToOne message:
+    a "ca_permeable" channel feeds its current into the pool, a
+    "ca_dependent" one reads the pool concentration."""
+    pools = create_ca_pools(comps, poolSettings)
+    if chan_type == "ca_permeable":
+        moose.connect(channel, "IkOut", pools, "current", "OneToOne")
+    elif chan_type == "ca_dependent":
+        moose.connect(pools, "concOut", channel, "concen", "OneToOne")
+    else:
+        raise ValueError("unknown calcium concentration type %r" % (chan_type,))
+    return pools
+
+# channelSpecs must be a dictionary with keys:
+#    settings - ChannelSettings instance
+#    gbar - conductance of channel for this component
+#    Ek -
+def addChannelToComps(channelSpecs, comps, number=1,
+        poolSettings=channels.Ca_pool_settings):
+    """Make `number` copies of the channel prototype for the vec `comps`
+    (pass len(comps) to cover every compartment) and connect them with
+    one OneToOne message, plus the calcium pools the channel uses."""
+    settings = channelSpecs["settings"]
+    container = comps[0].parent.path
+    protoChannel = create_channel_proto(settings)
+    channel = moose.copy(protoChannel, container, settings.name+'_{}'.format(comps.name), number)
+    channel.Gbar = channelSpecs["gbar"] * np.pi*np.asarray(comps.length)*np.asarray(comps.diameter)
+    channel.Ek = channelSpecs["Ek"]
+    moose.connect(channel, "channel", comps, "channel", "OneToOne")
+    if(settings.chan_type!=""):
+        add_calcium(comps, poolSettings, channel, settings.chan_type)
+    return channel
+
+# GENESIS morphology *.p file
+def load_genesis_file(fileName, cellPath):
+    return moose.loadModel(fileName, cellPath)
+
+# NEURON morphology *.swc file
+def load_neuron_file(fileName, cellPath, RM, RA, CM, initVm=None, Em=None):
+    return cells.load_neuron_file(fileName, cellPath, RM, RA, CM, initVm, Em)
+
+def neuron_file_index(fileName):
+    return cells.neuron_file_index(fileName)
+
+def _time(func, repeat):
+    start = time.time()
+    for i in range(repeat):
+        func(i)
+    return (time.time() - start) / repeat
+
+def benchmark(repeat=1000, path="/bench"):
+    """Seconds per call of each helper; tests/test_helpers.py checks
+    what they build.
+
+    Returns
+    -------
+    timings : dict
+        helper name -> seconds per call
+    """
+    if moose.exists(path):
+        moose.delete(path)
+    moose.Neutral(path)
+    RM, RA, CM = 2.8, 4.0, 0.03
+    timings = {}
+    timings["create_compartment"] = _time(lambda i: create_compartment(
+            "%s/c%d" % (path, i), 25e-6, 20e-6, 1e-9, 1e-10, RM, RA, CM, -65e-3), repeat)
+    comp = create_spherical_compartment(path + "/soma", 25e-6, 20e-6, RM, RA, CM)
+    timings["create_spherical_compartment"] = _time(lambda i:
+            create_spherical_compartment("%s/s%d" % (path, i), 25e-6, 20e-6, RM, RA, CM), repeat)
+    timings["create_pulse"] = _time(lambda i: create_pulse("%s/p%d" % (path, i),
+            50e-3, 100e-3, 1e-9, comp), repeat)
+    timings["create_table"] = _time(lambda i: create_table("%s/t%d" % (path, i),
+            comp, "getVm"), repeat)
+    comps = moose.vec(path + "/vec", n=repeat, dtype="Compartment")
+    timings["create_tables"] = _time(lambda i: create_tables(path + "/tabs",
+            comps, "getVm"), 1) / repeat
+    timings["create_channel_proto"] = _time(lambda i:
+            create_channel_proto(channels.Na_settings), repeat)
+    timings["create_ca_pool_proto"] = _time(lambda i:
+            create_ca_pool_proto(channels.Ca_pool_settings), repeat)
+    start = time.time()
+    addChannelToComps({"settings": channels.CaL_settings, "gbar": 1,
+            "Ek": 0.13}, comps, len(comps))
+    addChannelToComps({"settings": channels.SK_settings, "gbar": 1,
+            "Ek": -0.082}, comps, len(comps))
+    timings["addChannelToComps"] = (time.time() - start) / 2
+    moose.delete(path)
+    return timings
+
+if __name__ == '__main__':
+    for name, seconds in sorted(benchmark().items()):
+        print("%-30s %8.1f us" % (name, seconds * 1e6))
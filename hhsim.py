@@ -0,0 +1,432 @@
+"""Hodgkin-Huxley compartments integrated with NumPy, without MOOSE.
+
+Channels, gates and calcium pools are described with the same
+ChannelSettings/AbParams/CaDepParams/PoolSettings tuples as the MOOSE
+scripts, and use the same lookup tables (see channels.gate_tables). All
+N compartments of a Compartments object are advanced together with
+exponential Euler, the scheme MOOSE's Compartment and HHChannel use.
+"""
+import numpy as np
+
+import channels
+from channels import EREST_ACT
+
+FARADAY = 96485.33289
+
+def _index(xMin, xMax, n, x):
+    """Table index of x on an n-division grid over xMin..xMax, without
+    interpolation, as HHGate does by default."""
+    idx = ((x - xMin) * (n / float(xMax - xMin))).astype(np.intp)
+    np.clip(idx, 0, n, out=idx)
+    return idx
+
+#: (first table coordinate, entries per unit) of each CaGrid
+_grid_scales = {}
+
+def _position(grid, x):
+    """Table index and fraction of the way to the next entry of x on a
+    channels.CaGrid, for linear interpolation."""
+    scale = _grid_scales.get(grid)
+    if scale is None:
+        scale = _grid_scales[grid] = (grid.caMin,
+                grid.divs / float(grid.caMax - grid.caMin))
+    pos = (x - scale[0]) * scale[1]
+    np.clip(pos, 0, grid.divs, out=pos)
+    idx = np.minimum(pos.astype(np.intp), grid.divs - 1)
+    return idx, pos - idx
+
+class Gate(object):
+    """One gate of a channel: a state array plus its rate tables.
+
+    Without a `grid` the tables span xMin..xMax uniformly and are read
+    without interpolation, as HHGate does by default; with a
+    channels.CaGrid they are interpolated linearly.
+    """
+    def __init__(self, tables, power, xMin, xMax, number, grid=None):
+        self.tableA, self.tableB = tables
+        self.power = power
+        self.xMin = xMin
+        self.xMax = xMax
+        if grid is None:
+            self.grid = (xMin, xMax, len(self.tableA) - 1)
+        else:
+            self.grid = grid
+        self.interpolate = grid is not None
+        self.state = np.zeros(number)
+        self.inf = self.tableA / self.tableB
+        self.dt = None
+
+    def _lookup(self, table, idx):
+        if not self.interpolate:
+            return table[idx]
+        idx, frac = idx
+        lo = table[idx]
+        return lo + (table[idx + 1] - lo) * frac
+
+    def reinit(self, idx):
+        self.state[:] = self._lookup(self.inf, idx)
+
+    def advance(self, idx, dt):
+        if dt != self.dt:
+            #: exponential Euler factor for every table entry
+            self.decay = np.exp(-self.tableB * dt)
+            self.dt = dt
+        inf = self._lookup(self.inf, idx)
+        self.state -= inf
+        self.state *= self._lookup(self.decay, idx)
+        self.state += inf
+
+    def value(self):
+        if self.power == 1:
+            return self.state
+        return self.state ** self.power
+
+class Channel(object):
+    """HH channel present in every compartment of a Compartments object.
+
+    Parameters
+    ----------
+    settings : ChannelSettings
+    Gbar : numpy.ndarray
+        absolute conductance (S) in each compartment
+    Ek : float
+        reversal potential (V)
+    caMaxError : float
+        Z gate table accuracy, see channels.ca_grid; with
+        caMaxError None the Z gate uses the caDivs table like MOOSE
+    """
+    def __init__(self, settings, Gbar, Ek,
+            vDivs  = channels.VDIVS,
+            vMin   = channels.VMIN,
+            vMax   = channels.VMAX,
+            caDivs = channels.CADIVS,
+            caMin  = channels.CAMIN,
+            caMax  = channels.CAMAX,
+            caMaxError = channels.CA_MAX_ERROR):
+        number = len(Gbar)
+        caGrid = channels.channel_ca_grid(settings, caMaxError, caMin, caMax)
+        tables = channels.gate_tables(settings, vDivs, vMin, vMax,
+                caDivs, caMin, caMax, caGrid)
+        self.settings = settings
+        self.name = settings.name
+        self.chan_type = settings.chan_type
+        self.Gbar = np.array(Gbar, dtype=np.float64)
+        self.Ek = Ek
+        self.gates = []
+        self.caGates = []
+        if settings.xPower > 0:
+            self.gates.append(Gate(tables["X"], settings.xPower, vMin, vMax, number))
+        if settings.yPower > 0:
+            self.gates.append(Gate(tables["Y"], settings.yPower, vMin, vMax, number))
+        if settings.zPower > 0:
+            self.caGates.append(Gate(tables["Z"], settings.zPower, caMin, caMax,
+                    number, caGrid))
+        self.Gk = np.zeros(number)
+        self.Ik = np.zeros(number)
+
+    def reinit(self, Vm, Ca, index):
+        for gate in self.gates:
+            gate.reinit(index(gate.grid, Vm))
+        for gate in self.caGates:
+            gate.reinit(index(gate.grid, Ca))
+        self.conductance(Vm)
+
+    def advance(self, Vm, Ca, dt, index):
+        for gate in self.gates:
+            gate.advance(index(gate.grid, Vm), dt)
+        for gate in self.caGates:
+            gate.advance(index(gate.grid, Ca), dt)
+        self.conductance(Vm)
+
+    def conductance(self, Vm):
+        Gk = self.Gbar.copy()
+        for gate in self.gates + self.caGates:
+            Gk *= gate.value()
+        self.Gk = Gk
+        self.Ik = Gk * (self.Ek - Vm)
+
+class SynChan(object):
+    """Dual-exponential synaptic conductance like moose.SynChan.
+
+    Spikes are fed in through `activation`, the summed weight of the
+    spikes arriving in the current step, or played from precomputed
+    trains (see play); a spike of weight w gives a conductance peaking
+    at w * Gbar.
+    """
+    chan_type = ""
+
+    def __init__(self, name, number, Ek, Gbar=1e-9, tau1=1e-3, tau2=5e-3):
+        self.name = name
+        self.Ek = Ek
+        self.Gbar = Gbar
+        self.tau1 = tau1
+        self.tau2 = tau2
+        self.activation = np.zeros(number)
+        self.X = np.zeros(number)
+        self.Y = np.zeros(number)
+        self.Gk = np.zeros(number)
+        self.Ik = np.zeros(number)
+        #: Y of a unit spike peaks at this value
+        if tau1 == tau2:
+            peak = 1 / np.e
+        else:
+            tpeak = tau1 * tau2 * np.log(tau1 / tau2) / (tau1 - tau2)
+            peak = tau2 / (tau1 - tau2) * (np.exp(-tpeak / tau1) - np.exp(-tpeak / tau2))
+        self.norm = Gbar / peak
+        self.times = np.empty(0)
+        self.targets = np.empty(0, dtype=np.intp)
+        self.weight = 1.0
+        self.t = 0.0
+        self.next = 0
+
+    def play(self, times, targets, weight=1.0):
+        """Deliver a spike of `weight` to compartment targets[i] at
+        times[i], like a TimeTable feeding a SimpleSynHandler; `times`
+        must be sorted."""
+        self.times = np.asarray(times, dtype=np.float64)
+        self.targets = np.asarray(targets, dtype=np.intp)
+        self.weight = weight
+
+    def reinit(self, Vm, Ca, index):
+        for x in (self.activation, self.X, self.Y, self.Gk, self.Ik):
+            x[:] = 0
+        self.t = 0.0
+        self.next = 0
+
+    def advance(self, Vm, Ca, dt, index):
+        if self.next < len(self.times):
+            stop = np.searchsorted(self.times, self.t + dt, side="left")
+            np.add.at(self.activation, self.targets[self.next:stop], self.weight)
+            self.next = stop
+        self.t += dt
+        # X jumps by the spike weight and decays with tau1; Y is driven
+        # by X / tau1 and decays with tau2
+        self.X *= np.exp(-dt / self.tau1)
+        self.X += self.activation
+        decay = np.exp(-dt / self.tau2)
+        self.Y *= decay
+        self.Y += self.X * (self.tau2 / self.tau1 * (1.0 - decay))
+        self.activation[:] = 0
+        self.Gk = self.Y * self.norm
+        self.Ik = self.Gk * (self.Ek - Vm)
+
+class _IndexCache(object):
+    """Table indices computed once per step for each (grid, variable)
+    pair, so gates sharing a grid share the lookup."""
+    def __init__(self):
+        self.cache = {}
+
+    def __call__(self, grid, x):
+        key = (grid, id(x))
+        idx = self.cache.get(key)
+        if idx is None:
+            if isinstance(grid, channels.CaGrid):
+                idx = _position(grid, x)
+            else:
+                idx = _index(grid[0], grid[1], grid[2], x)
+            self.cache[key] = idx
+        return idx
+
+class CaPool(object):
+    """CaConc-style pool in a shell of `thick` under each compartment's
+    membrane; Ca-permeable channels raise it, it decays to CaBasal."""
+    def __init__(self, settings, length, diameter):
+        self.settings = settings
+        self.name = settings.name
+        self.CaBasal = settings.CaBasal
+        self.tau = settings.CaTau
+        SA = np.pi*length*diameter
+        vol = SA*settings.CaThick
+        self.B = 1/(FARADAY*vol*2)/settings.BufCapacity
+        self.floor = 0
+        self.ceiling = 1
+        self.Ca = np.full(len(length), settings.CaBasal)
+
+    def reinit(self):
+        self.Ca[:] = self.CaBasal
+
+    def advance(self, current, dt):
+        decay = np.exp(-dt / self.tau)
+        c = (self.Ca - self.CaBasal) * decay
+        c += self.B * current * self.tau * (1.0 - decay)
+        np.clip(c + self.CaBasal, self.floor, self.ceiling, out=self.Ca)
+
+class Compartments(object):
+    """N isopotential compartments sharing the same set of channels.
+
+    Fields mirror moose.Compartment (Vm, Em, initVm, Rm, Cm, inject) and
+    hold one value per compartment.
+    """
+    def __init__(self, number=1, diameter=30e-6, length=50e-6,
+            Em=EREST_ACT, initVm=EREST_ACT, RM=1/0.3e1, CM=1e-2):
+        self.number = number
+        self.diameter = np.full(number, diameter, dtype=np.float64)
+        self.length = np.full(number, length, dtype=np.float64)
+        sarea = np.pi * self.diameter * self.length
+        self.Em = np.full(number, Em, dtype=np.float64)
+        self.initVm = np.full(number, initVm, dtype=np.float64)
+        self.Rm = RM / sarea
+        self.Cm = CM * sarea
+        self.Vm = self.initVm.copy()
+        self.inject = np.zeros(number)
+        self.channels = []
+        self.pool = None
+
+    @property
+    def area(self):
+        return np.pi * self.diameter * self.length
+
+    def add_channel(self, settings, gbar, Ek, **tableArgs):
+        """Add a channel with specific conductance `gbar` (S/m^2) to
+        every compartment, as addChannelToComps does."""
+        channel = Channel(settings, gbar * self.area, Ek, **tableArgs)
+        self.channels.append(channel)
+        return channel
+
+    def add_synchan(self, name, Ek, gbar=1e-9, tau1=1e-3, tau2=5e-3):
+        """Add a SynChan with absolute conductance `gbar` to every
+        compartment, as createSynapse does."""
+        synchan = SynChan(name, self.number, Ek, gbar, tau1, tau2)
+        self.channels.append(synchan)
+        return synchan
+
+    def add_calcium(self, poolSettings):
+        self.pool = CaPool(poolSettings, self.length, self.diameter)
+        return self.pool
+
+    def channel(self, name):
+        for channel in self.channels:
+            if channel.name == name:
+                return channel
+        raise KeyError(name)
+
+    @property
+    def Ca(self):
+        if self.pool is None:
+            return np.zeros(self.number)
+        return self.pool.Ca
+
+    def reinit(self):
+        self.Vm[:] = self.initVm
+        if self.pool is not None:
+            self.pool.reinit()
+        index = _IndexCache()
+        Ca = self.Ca
+        for channel in self.channels:
+            channel.reinit(self.Vm, Ca, index)
+
+    def step(self, dt):
+        """Advance gates, calcium and Vm by one timestep."""
+        Ca = self.Ca
+        Gk = np.zeros(self.number)
+        GkEk = np.zeros(self.number)
+        caCurrent = None
+        index = _IndexCache()
+        for channel in self.channels:
+            channel.advance(self.Vm, Ca, dt, index)
+            Gk += channel.Gk
+            GkEk += channel.Gk * channel.Ek
+            if channel.chan_type == "ca_permeable":
+                if caCurrent is None:
+                    caCurrent = channel.Ik.copy()
+                else:
+                    caCurrent += channel.Ik
+        if self.pool is not None and caCurrent is not None:
+            self.pool.advance(caCurrent, dt)
+        elif self.pool is not None:
+            self.pool.advance(np.zeros(self.number), dt)
+        self.update_vm(Gk, GkEk, dt)
+
+    def update_vm(self, Gk, GkEk, dt):
+        A = self.Em / self.Rm + GkEk + self.inject
+        B = 1.0 / self.Rm + Gk
+        decay = np.exp(-B * dt / self.Cm)
+        self.Vm *= decay
+        self.Vm += A / B * (1.0 - decay)
+
+    def run(self, simtime, simdt, plotdt=None, stimulus=None, record=None):
+        """Integrate for `simtime` seconds from the current state.
+
+        Parameters
+        ----------
+        simtime, simdt : float
+            duration and integration timestep (s)
+        plotdt : float
+            sampling interval of the recorded traces; defaults to simdt
+        stimulus : callable, optional
+            stimulus(t) returns the injected current (A), a scalar or one
+            value per compartment; it is written to `inject` every step
+        record : dict, optional
+            name -> callable(self) returning the value to record; Vm and
+            inject are always recorded
+
+        Returns
+        -------
+        ts : numpy.ndarray
+            sample times
+        traces : dict
+            name -> array of shape (number, len(ts))
+        """
+        if plotdt is None:
+            plotdt = simdt
+        every = max(1, int(round(plotdt / simdt)))
+        nsteps = int(round(simtime / simdt))
+        nrec = nsteps // every + 1
+        probes = {"Vm": lambda c: c.Vm, "inject": lambda c: c.inject}
+        if record:
+            probes.update(record)
+        traces = dict((name, np.empty((self.number, nrec))) for name in probes)
+        if stimulus is not None:
+            self.inject[:] = stimulus(0.0)
+        for name, probe in probes.items():
+            traces[name][:, 0] = probe(self)
+        for i in range(1, nsteps + 1):
+            self.step(simdt)
+            if stimulus is not None:
+                self.inject[:] = stimulus(i * simdt)
+            if i % every == 0:
+                for name, probe in probes.items():
+                    traces[name][:, i // every] = probe(self)
+        ts = np.arange(nrec) * (every * simdt)
+        return ts, traces
+
+def pulse(delay, width, level):
+    """Stimulus function equivalent to create_pulse's PulseGen: `level`
+    from `delay` to `delay + width`, zero otherwise. `level` may be an
+    array with one value per compartment."""
+    level = np.asarray(level, dtype=np.float64)
+    zero = np.zeros_like(level)
+    def stimulus(t):
+        if delay <= t < delay + width:
+            return level
+        return zero
+    return stimulus
+
+def create_1comp_neuron(number=1):
+    """Create `number` single-compartment neurons with the channels
+    create_1comp_neuron in hw9.py uses."""
+    comps = Compartments(number,
+            diameter = 30e-6,
+            length   = 50e-6,
+            Em       = EREST_ACT + 10.613e-3,
+            initVm   = EREST_ACT,
+            #: RM = 1 / (0.3 mS/cm^2)
+            RM       = 1 / (0.3e-3 * 1e4),
+            #: CM = 1 uF/cm^2
+            CM       = 1e-6 * 1e4)
+    comps.add_channel(channels.Na_settings, 1200, 115e-3 + EREST_ACT)
+    comps.add_channel(channels.K_settings, 360, -12e-3 + EREST_ACT)
+    comps.add_channel(channels.SK_settings, 0, -12e-3 + EREST_ACT)
+    comps.add_channel(channels.CaL_settings, 0, -12e-3 + EREST_ACT)
+    comps.add_calcium(channels.Ca_pool_settings)
+    return comps
+
+def current_step_test(simtime, simdt, plotdt, level=1e-9):
+    """NumPy version of current_step_test: a 40 ms wide current pulse
+    starting 20 ms into the run. Returns the same (ts, current, vm)
+    vectors as the MOOSE version."""
+    comp = create_1comp_neuron()
+    comp.reinit()
+    ts, traces = comp.run(simtime, simdt, plotdt,
+            stimulus=pulse(20e-3, 40e-3, level))
+    return ts, traces["inject"][0], traces["Vm"][0]
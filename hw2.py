@@ -1,42 +1,7 @@
 import moose
-import numpy
-import sys
-import matplotlib.pyplot as pyplot
-
-def create_compartment(name,length,diameter,surfaceArea,xArea,membraneResistivity,axialResistivity,capacitivity): # Em, initVm?
-    newC = moose.Compartment(name)
-    newC.length = length
-    newC.diameter = diameter
-    #newC.Em = Em
-    #newC.initVm = initVm
-    newC.Rm = float(membraneResistivity) / surfaceArea
-    newC.Cm = capacitivity * surfaceArea
-    newC.Ra = float(axialResistivity * length) / xArea
-    return newC
-
-def create_spherical_compartment(name,length,diameter,membraneResistivity,axialResistivity,capacitivity):
-    surfaceArea = numpy.pi*diameter**2
-    xArea = float(surfaceArea) / 4 
-    return create_compartment(name,length,diameter,surfaceArea,xArea,membraneResistivity,axialResistivity,capacitivity)
-
-def create_pulse(pulsename,pulsedelay,pulsewidth,pulselevel,pulsecomp):
-    pulse = moose.PulseGen(pulsename)
-    pulse.delay[0]=pulsedelay
-    pulse.width[0]=pulsewidth
-    pulse.level[0]=pulselevel
-    pulse.delay[1]=1e9
-    moose.connect(pulse,"output",pulsecomp,"injectMsg")
-    return pulse
-
-def create_table(tablename, tablecomp, compproperty):
-    tab = moose.Table(tablename)
-    moose.connect(tab,"requestOut",tablecomp,compproperty)
-    return tab
-
-def plot_table(table):
-    x = numpy.fromiter((i*table.dt for i in range(table.size)), float, table.size)
-    y = table.vector
-    pyplot.plot(x, y)
+from backends import pyplot
+from helpers import (create_spherical_compartment, create_pulse, create_table,
+        plot_table)
 
 def main():
     neuron = moose.Neutral("/neuron")
@@ -1,80 +1,58 @@
 import moose
 import numpy
-import sys
-import matplotlib.pyplot as pyplot
+from backends import pyplot
 
-def create_compartment(name,length,diameter,surfaceArea,xArea,membraneResistivity,axialResistivity,capacitivity): # Em, initVm?
-    newC = moose.Compartment(name)
-    newC.length = length
-    newC.diameter = diameter
-    #newC.Em = Em
-    #newC.initVm = initVm
-    newC.Rm = float(membraneResistivity) / surfaceArea
-    newC.Cm = capacitivity * surfaceArea
-    newC.Ra = float(axialResistivity * length) / xArea
-    return newC
-
-def create_spherical_compartment(name,length,diameter,membraneResistivity,axialResistivity,capacitivity):
-    surfaceArea = numpy.pi*diameter**2
-    xArea = float(surfaceArea) / 4 
-    return create_compartment(name,length,diameter,surfaceArea,xArea,membraneResistivity,axialResistivity,capacitivity)
-
-def create_pulse(pulsename,pulsedelay,pulsewidth,pulselevel,pulsecomp):
-    pulse = moose.PulseGen(pulsename)
-    pulse.delay[0]=pulsedelay
-    pulse.width[0]=pulsewidth
-    pulse.level[0]=pulselevel
-    pulse.delay[1]=1e9
-    moose.connect(pulse,"output",pulsecomp,"injectMsg")
-    return pulse
-
-def create_table(tablename, tablecomp, compproperty):
-    tab = moose.Table(tablename)
-    moose.connect(tab,"requestOut",tablecomp,compproperty)
-    return tab
-
-def plot_table(table):
-    plot_tables([table])
-
-def plot_tables(tables):
-    #pyplot.clf() # clear figure
-    for table in tables:
-        x = numpy.fromiter((i*table.dt for i in range(table.size)), float, table.size)
-        y = table.vector
-        pyplot.plot(x, y)
+import sweep
+from helpers import (create_spherical_compartment, create_pulse, create_table)
 
 def run_sim():
     moose.reinit()
-    moose.start(900e-3)
+    moose.start(SIMTIME)
+
+SIMTIME = 900e-3
+
+def run_trial(simDt, dendCount, totalLength=100e-6, root="/trial"):
+    """Build the soma plus `dendCount` dendrites under a fresh `root`
+    element, run it with timestep `simDt` and return the soma and
+    middle-dendrite Vm traces, sampled every simDt. The tree is deleted
+    afterwards, so points run in one process (processes=0) do not see
+    each other's elements."""
+    if moose.exists(root):
+        moose.delete(root)
+    moose.Neutral(root)
+    neuron = moose.Neutral(root + "/neuron")
+    inputs = moose.Neutral(root + "/inputs")
+    outputs = moose.Neutral(root + "/outputs")
+
+    soma = create_spherical_compartment(neuron.path + "/soma",25e-6,20e-6,2.8,4.0,0.01)
+    create_pulse(inputs.path + "/somaPulse",50e-3,100e-3,1e-9,soma)
+    vmtable = create_table(outputs.path + "/somaVmTable",soma,"getVm")
+    dendVmtable = None
+    dends = []
+    for i in range(dendCount):
+        dend = create_spherical_compartment(neuron.path + "/dendrite" + str(i),totalLength/dendCount,2e-6,2.8,4.0,0.01)
+        moose.setClock(dend.tick, simDt)
+        prev = soma if i==0 else dends[i-1]
+        moose.connect(prev,"axialOut",dend,"handleAxial")
+        dends.append(dend)
+        if i == dendCount//2:
+            dendVmtable = create_table(outputs.path + "/dendVmTable",dend,"getVm")
+    moose.setClock(soma.tick, simDt)
+    moose.setClock(vmtable.tick, simDt)
+    run_sim()
+    traces = [numpy.array(vmtable.vector), numpy.array(dendVmtable.vector)]
+    moose.delete(root)
+    return traces
 
 def main():
-    neuron = moose.Neutral("/neuron")
-    inputs = moose.Neutral("/inputs")
-    outputs = moose.Neutral("/outputs")
-    
-    soma = create_spherical_compartment("/neuron/soma",25e-6,20e-6,2.8,4.0,0.01)
-    pulse = create_pulse("/inputs/somaPulse",50e-3,100e-3,1e-9,soma)
-    vmtable = create_table('outputs/somaVmTable',soma,"getVm")
-
-    for di, simDt in enumerate([5e-5, 1e-3, 5e-3]):
-        for ci, dendCount in enumerate([1, 5]):
-            totalLength = 100e-6
-            dendVmtable = None
-            dends = []
-            for i in range(dendCount):
-                dend = create_spherical_compartment("/neuron/dendrite" + str(i),totalLength/dendCount,2e-6,2.8,4.0,0.01)
-                moose.setClock(dend.tick, simDt)
-                prev = soma if i==0 else dends[i-1]
-                moose.connect(prev,"axialOut",dend,"handleAxial")
-                dends.append(dend)
-                if i == dendCount//2:
-                    dendVmtable = create_table('outputs/dendVmTable'+str(di*2+ci),dend,"getVm")
-            moose.setClock(soma.tick, simDt)
-            run_sim()
-            print(vmtable)
-            print(dendVmtable)
-            plot_tables([vmtable, dendVmtable])
-    
+    points = sweep.grid(("simDt", [5e-5, 1e-3, 5e-3]), ("dendCount", [1, 5]))
+    nsamples = int(round(SIMTIME / min(p["simDt"] for p in points))) + 1
+    results, lengths = sweep.run_sweep(run_trial, points, (2, nsamples))
+    for point, traces, n in zip(points, results, lengths):
+        t = numpy.arange(n) * point["simDt"]
+        pyplot.plot(t, traces[0, :n])
+        pyplot.plot(t, traces[1, :n])
     pyplot.show()
 
-main()
+if __name__ == '__main__':
+    main()
@@ -1,61 +1,7 @@
 import moose
-import numpy
-import sys
-import matplotlib.pyplot as pyplot
-
-def create_compartment(name,length,diameter,surfaceArea,xArea,membraneResistivity,axialResistivity,capacitivity): # Em, initVm?
-    newC = moose.Compartment(name)
-    newC.length = length
-    newC.diameter = diameter
-    #newC.Em = Em
-    #newC.initVm = initVm
-    newC.Rm = float(membraneResistivity) / surfaceArea
-    newC.Cm = capacitivity * surfaceArea
-    newC.Ra = float(axialResistivity * length) / xArea
-    return newC
-
-def create_spherical_compartment(name,length,diameter,membraneResistivity,axialResistivity,capacitivity):
-    surfaceArea = numpy.pi*diameter**2
-    xArea = float(surfaceArea) / 4 
-    return create_compartment(name,length,diameter,surfaceArea,xArea,membraneResistivity,axialResistivity,capacitivity)
-
-def create_pulse(pulsename,pulsedelay,pulsewidth,pulselevel,pulsecomp):
-    pulse = moose.PulseGen(pulsename)
-    pulse.delay[0]=pulsedelay
-    pulse.width[0]=pulsewidth
-    pulse.level[0]=pulselevel
-    pulse.delay[1]=1e9
-    moose.connect(pulse,"output",pulsecomp,"injectMsg")
-    return pulse
-
-def create_table(tablename, tablecomp, compproperty):
-    tab = moose.Table(tablename)
-    moose.connect(tab,"requestOut",tablecomp,compproperty)
-    return tab
-
-def plot_table(table):
-    plot_tables([table])
-
-def plot_tables(tables):
-    pyplot.clf() # clear figure
-    for table in tables:
-        x = numpy.fromiter((i*table.dt for i in range(table.size)), float, table.size)
-        y = table.vector
-        pyplot.plot(x, y)
-
-
-# GENESIS morphology *.p file
-def load_genesis_file(fileName, cellPath):
-    return moose.loadModel(fileName, cellPath)
-
-# NEURON morphology *.swc file
-def load_neuron_file(fileName, cellPath, RM, RA, CM):
-    cell = moose.loadModel(fileName, cellPath)
-    for child in cell[0].children:
-        for comp in child:
-            comp.RM = RM
-            comp.RA = RA
-            comp.CM = CM
+from backends import pyplot
+from helpers import (create_spherical_compartment, create_pulse, create_table,
+        plot_table, load_genesis_file, load_neuron_file)
 
 def main():
     neuron = moose.Neutral("/neuron")
@@ -79,7 +25,7 @@ def main():
     #moose.showmsg(pulse)
     #moose.showmsg(vmtable)
 
-    plot_table(vmtable)
+    plot_table(vmtable, clear=True)
     pyplot.show()
 
     pNeuron = load_genesis_file("layer2.p", "/pNeuron")
@@ -87,7 +33,8 @@ def main():
 
     moose.le(neuron)
     moose.le(pNeuron)
-    moose.le(swcNeuron)
+    # one Compartment vec, named as in morphology.compartment_names
+    print("%s: %d compartments" % (swcNeuron.path, len(swcNeuron)))
 
     #t = pylab.linspace(0, 300e-3, len(vmtable.vector))
     #pylab.plot(t,)
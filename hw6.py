@@ -45,9 +45,9 @@
 
 # Code:
 import numpy as np
-import matplotlib.pyplot as plt
 import moose
 import collections
+from helpers import (create_pulse, create_table, plot_tables)
 
 EREST_ACT = -70e-3 #: Resting membrane potential
 
@@ -276,22 +276,6 @@ def create_1comp_neuron(path, number=1):
         addChannelToComps(channel, comps)
     return comps
 
-def create_compartment(name,length,diameter,surfaceArea,xArea,membraneResistivity,axialResistivity,capacitivity,Em,initVm): # Em, initVm?
-	newC = moose.Compartment(name)
-	newC.length = length
-	newC.diameter = diameter
-	newC.Em = Em
-	newC.initVm = initVm
-	newC.Rm = membraneResistivity * 1.0 / surfaceArea
-	newC.Cm = capacitivity * surfaceArea
-	newC.Ra = axialResistivity * length * 1.0 / xArea
-	return newC
-
-def create_spherical_compartment(name,length,diameter,membraneResistivity,axialResistivity,capacitivity,Em,initVm):
-	surfaceArea = np.pi*diameter**2
-	xArea = surfaceArea * 1.0 /4 
-	return create_compartment(name,length,diameter,surfaceArea,xArea,membraneResistivity,axialResistivity,capacitivity,Em,initVm)
-
 def addChannels(comp):
         container = comp.parent.path
         nachan = moose.copy(create_na_proto(), container, 'na_{}'.format(comp.name), 1)
@@ -303,31 +287,6 @@ def addChannels(comp):
         kchan.Ek = -12e-3 + EREST_ACT
         moose.connect(kchan, 'channel', comp, 'channel', 'OneToOne')
 
-def create_pulse(pulsename,pulsedelay,pulsewidth,pulselevel,pulsecomp):
-    pulse = moose.PulseGen(pulsename)
-    pulse.delay[0]=pulsedelay
-    pulse.width[0]=pulsewidth
-    pulse.level[0]=pulselevel
-    pulse.delay[1]=1e9
-    moose.connect(pulse,"output",pulsecomp,"injectMsg")
-    return pulse
-
-def create_table(tablename, tablecomp, compproperty):
-    tab = moose.Table(tablename)
-    moose.connect(tab,"requestOut",tablecomp,compproperty)
-    return tab
-
-def plot_table(table):
-    plot_tables([table])
-
-def plot_tables(tables):
-    #pyplot.clf() # clear figure
-    for table in tables:
-        x = np.fromiter((i*table.dt for i in range(table.size)), float, table.size)
-        y = table.vector
-        plt.plot(x, y)
-    plt.show()
-
 def current_step_test(simtime, simdt, plotdt):
     """
     Create a single compartment and set it up for applying a step
@@ -399,7 +358,7 @@ closing or opening.
     simdt = 0.25e-5
     plotdt = 0.25e-3
     ts, current, vm = current_step_test(simtime, simdt, plotdt)
-    plot_tables([vm, current])
+    plot_tables([vm, current], show=True)
 
 if __name__ == '__main__':
     main()
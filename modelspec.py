@@ -0,0 +1,340 @@
+"""Declarative model specifications compiled to MOOSE or hhsim.
+
+A spec is a JSON (or TOML) document describing one kind of neuron:
+
+    {
+      "name": "hh_1comp",
+      "compartments": {"number": 1, "diameter": 30e-6, "length": 50e-6,
+                       "Em": -0.059387, "initVm": -0.07,
+                       "RM": 0.3333, "CM": 0.01},
+      "channels": [{"settings": "Na_settings", "gbar": 1200, "Ek": 0.045},
+                   {"settings": {"name": "kdr", "xPower": 2,
+                                 "xParam": [28.2, 0, 0, 0, -12.5e-3,
+                                            6.78, 0, 0, 0, 33.5e-3]},
+                    "gbar": 0, "Ek": -0.082}],
+      "pool": "Ca_pool_settings",
+      "synapses": [{"name": "excitatory", "Ek": 0, "rate": 10}],
+      "stimuli": [{"delay": 20e-3, "width": 40e-3, "level": 1e-9}]
+    }
+
+Channels and pools are either the name of a constant in channels.py or
+the fields of a ChannelSettings/PoolSettings; AbParams and CaDepParams
+are lists in field order or objects. compile_spec validates a spec once
+per content hash; build_engine and build_moose then skip rebuilding a
+model they have already built from the same spec. Compiled models and
+engine models are also pickled to the cache directory, so sweep workers
+(a fresh process per point) reuse them too.
+"""
+import collections
+import copy
+import json
+import os
+import pickle
+import sys
+
+import numpy as np
+
+import cache
+import channels
+import helpers
+import hhsim
+import synapses
+from backends import moose
+
+Model = collections.namedtuple("Model", [
+    "name",
+    "key",          # content hash of the spec
+    "compartments", # dict of Compartments arguments
+    "channels",     # list of (ChannelSettings, gbar (S/m^2), Ek)
+    "pool",         # PoolSettings or None
+    "synapses",     # list of SynapseSpec
+    "stimuli"       # list of StimulusSpec
+    ])
+
+SynapseSpec = collections.namedtuple("SynapseSpec", [
+    "name", "Ek", "gbar", "tau1", "tau2",
+    "rate",         # Poisson rate of each input (Hz), 0 for none
+    "numInputs", "simtime", "refractT", "seed"
+    ])
+
+StimulusSpec = collections.namedtuple("StimulusSpec", [
+    "delay", "width", "level"
+    ])
+
+COMPARTMENT_DEFAULTS = {
+    "number": 1,
+    "diameter": 30e-6,
+    "length": 50e-6,
+    "Em": channels.EREST_ACT,
+    "initVm": channels.EREST_ACT,
+    "RM": 1 / 0.3e1,
+    "CM": 1e-2,
+}
+
+SYNAPSE_DEFAULTS = {
+    "Ek": 0, "gbar": 1e-9, "tau1": 1e-3, "tau2": 5e-3,
+    "rate": 0, "numInputs": 1, "simtime": 1, "refractT": 1e-3, "seed": None,
+}
+
+#: Compiled specs: content hash -> Model
+_models = {}
+#: Pristine engine models: (content hash, number) -> hhsim.Compartments
+_engines = {}
+#: MOOSE trees built in this process: path -> (content hash, number)
+_built = {}
+
+def forget():
+    """Drop the models kept in this process, so the next builds go to
+    the disk cache as in a fresh process."""
+    _models.clear()
+    _engines.clear()
+    _built.clear()
+#: Hash of the code that decides what a spec compiles and builds to
+_code = []
+
+def _code_key():
+    """Content hash of channels.py, hhsim.py, synapses.py and this
+    module, so cached models are not reused after the code (or a named
+    constant such as Na_settings) changes."""
+    if not _code:
+        data = b""
+        for module in (channels, hhsim, synapses, sys.modules[__name__]):
+            with open(os.path.splitext(module.__file__)[0] + ".py", "rb") as f:
+                data += f.read()
+        _code.append(cache.bytes_digest(data))
+    return _code[0]
+
+def _cached(kind, key, build):
+    """`build()`, pickled in the cache under `kind` and `key` and read
+    back from there by later processes."""
+    path = cache.cache_path(kind, cache.digest(key, _code_key()), ".pkl")
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except (IOError, OSError, EOFError, pickle.UnpicklingError, AttributeError,
+            ImportError):
+        pass
+    value = build()
+    cache.atomic_save(path, lambda f: pickle.dump(value, f, pickle.HIGHEST_PROTOCOL))
+    return value
+
+def _check_keys(what, given, allowed, required=()):
+    unknown = set(given) - set(allowed)
+    if unknown:
+        raise ValueError("%s: unknown field(s) %s" % (what, ", ".join(sorted(unknown))))
+    missing = [k for k in required if k not in given]
+    if missing:
+        raise ValueError("%s: missing field(s) %s" % (what, ", ".join(missing)))
+
+def _fill(what, given, defaults, required=()):
+    _check_keys(what, given, list(defaults) + list(required), required)
+    values = dict(defaults)
+    values.update(given)
+    return values
+
+def _named(what, value, cls, required=()):
+    """Resolve `value` into a `cls` namedtuple: the name of a constant
+    in channels.py, a list in field order or an object of fields."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        constant = getattr(channels, value, None)
+        if not isinstance(constant, cls):
+            raise ValueError("%s: channels.%s is not a %s" % (what, value, cls.__name__))
+        return constant
+    if isinstance(value, (list, tuple)):
+        if len(value) != len(cls._fields):
+            raise ValueError("%s: expected %d values (%s)" % (what,
+                    len(cls._fields), ", ".join(cls._fields)))
+        return cls(*value)
+    _check_keys(what, value, cls._fields, required)
+    return cls(**value)
+
+def _channel_settings(what, value):
+    if not isinstance(value, dict):
+        return _named(what, value, channels.ChannelSettings)
+    fields = dict(xPower=0, yPower=0, zPower=0, eRev=0, xParam=None,
+            yParam=None, zParam=None, chan_type="")
+    fields.update(value)
+    _check_keys(what, fields, channels.ChannelSettings._fields, ["name"])
+    for gate, cls in (("x", channels.AbParams), ("y", channels.AbParams),
+            ("z", channels.CaDepParams)):
+        param = _named("%s.%sParam" % (what, gate), fields[gate + "Param"], cls)
+        if fields[gate + "Power"] > 0 and param is None:
+            raise ValueError("%s: %sPower > 0 needs %sParam" % (what, gate, gate))
+        fields[gate + "Param"] = param
+    if fields["chan_type"] not in ("", "ca_permeable", "ca_dependent"):
+        raise ValueError("%s: unknown chan_type %r" % (what, fields["chan_type"]))
+    return channels.ChannelSettings(**fields)
+
+def spec_key(spec):
+    """Content hash of a spec, independent of key order."""
+    return cache.digest(json.dumps(spec, sort_keys=True))
+
+def compile_spec(spec):
+    """Validate `spec` (a dict) and resolve it into a Model.
+
+    Gate tables of every channel are computed (or read from the disk
+    cache) here, so later builds only copy them.
+
+    Raises
+    ------
+    ValueError
+        if a field is unknown, missing or refers to an unknown constant
+    """
+    key = spec_key(spec)
+    model = _models.get(key)
+    if model is None:
+        model = _models[key] = _cached("spec", key, lambda: _compile(spec, key))
+    return model
+
+def _compile(spec, key):
+    _check_keys("spec", spec, ("name", "compartments", "channels", "pool",
+            "synapses", "stimuli"), ["compartments"])
+    comps = _fill("compartments", spec["compartments"], COMPARTMENT_DEFAULTS)
+    chans = []
+    names = set()
+    for i, chan in enumerate(spec.get("channels", [])):
+        what = "channels[%d]" % i
+        _check_keys(what, chan, ("settings", "gbar", "Ek"), ("settings", "gbar"))
+        settings = _channel_settings(what, chan["settings"])
+        if settings.name in names:
+            raise ValueError("%s: duplicate channel name %r" % (what, settings.name))
+        names.add(settings.name)
+        # the tables hhsim.Channel and create_channel_proto look up
+        channels.gate_tables(settings, caGrid=channels.channel_ca_grid(settings))
+        chans.append((settings, float(chan["gbar"]), float(chan.get("Ek", settings.eRev))))
+    pool = _named("pool", spec.get("pool"), channels.PoolSettings,
+            channels.PoolSettings._fields)
+    usesCa = [s.name for s, _, _ in chans if s.chan_type]
+    if usesCa and pool is None:
+        raise ValueError("channels %s need a calcium pool" % ", ".join(usesCa))
+    syns = []
+    for i, syn in enumerate(spec.get("synapses", [])):
+        values = _fill("synapses[%d]" % i, syn, SYNAPSE_DEFAULTS, ["name"])
+        syns.append(SynapseSpec(**values))
+    stims = [_named("stimuli[%d]" % i, stim, StimulusSpec, StimulusSpec._fields)
+            for i, stim in enumerate(spec.get("stimuli", []))]
+    return Model(spec.get("name", "neuron"), key, comps, chans, pool, syns, stims)
+
+def load(fileName):
+    """Read and compile a .json or .toml spec file.
+
+    Returns
+    -------
+    model : Model
+    """
+    if os.path.splitext(fileName)[1].lower() == ".toml":
+        try:
+            import tomllib as toml
+        except ImportError:
+            import toml
+        with open(fileName, "rb" if toml.__name__ == "tomllib" else "r") as f:
+            spec = toml.load(f)
+    else:
+        with open(fileName) as f:
+            spec = json.load(f)
+    return compile_spec(spec)
+
+def stimulus(model, number):
+    """hhsim stimulus function summing the pulses of `model`, or None."""
+    if not model.stimuli:
+        return None
+    pulses = [hhsim.pulse(s.delay, s.width, np.full(number, s.level))
+            for s in model.stimuli]
+    def total(t):
+        return sum(p(t) for p in pulses)
+    return total
+
+def build_engine(model, number=None):
+    """hhsim.Compartments for `model`, with `number` replicas (default:
+    the number in the spec).
+
+    Synapses with a rate get precomputed Poisson trains, independent in
+    every replica. The first build of a (spec, number) pair is kept and
+    later calls return a copy of it. It is also kept in the cache
+    directory unless a synapse draws unseeded trains, which must differ
+    between processes.
+    """
+    if number is None:
+        number = model.compartments["number"]
+    pristine = _engines.get((model.key, number))
+    if pristine is None:
+        if any(syn.rate > 0 and syn.seed is None for syn in model.synapses):
+            pristine = _build_engine(model, number)
+        else:
+            pristine = _cached("engine", (model.key, number),
+                    lambda: _build_engine(model, number))
+        _engines[(model.key, number)] = pristine
+    return copy.deepcopy(pristine)
+
+def _build_engine(model, number):
+    args = dict(model.compartments)
+    args["number"] = number
+    comps = hhsim.Compartments(**args)
+    for settings, gbar, Ek in model.channels:
+        comps.add_channel(settings, gbar, Ek)
+    if model.pool is not None:
+        comps.add_calcium(model.pool)
+    for syn in model.synapses:
+        synchan = comps.add_synchan(syn.name, syn.Ek, syn.gbar,
+                syn.tau1, syn.tau2)
+        if syn.rate > 0:
+            times, inputs = synapses.poisson_trains(syn.rate, syn.simtime,
+                    syn.numInputs * number, syn.refractT, syn.seed)
+            synchan.play(times, inputs // syn.numInputs)
+    return comps
+
+def build_moose(model, path, number=None):
+    """Build `model` under a Neutral at `path`: a compartment vec
+    `path`/comp with its channels, calcium pools, Poisson synapses and
+    pulse stimuli, all inside that container.
+
+    Calling it again with the same spec, path and number returns the
+    existing vec instead of rebuilding it. Any other model at `path` is
+    deleted with its container, so nothing stays connected to it.
+
+    Returns
+    -------
+    comps : moose.vec
+    """
+    if number is None:
+        number = model.compartments["number"]
+    if _built.get(path) == (model.key, number) and moose.exists(path):
+        return moose.vec(path + "/comp")
+    if moose.exists(path):
+        moose.delete(path)
+    container = moose.Neutral(path).path
+    c = model.compartments
+    comps = moose.vec(path=container + "/comp", n=number, dtype="Compartment")
+    sarea = np.pi * c["diameter"] * c["length"]
+    comps.diameter = c["diameter"]
+    comps.length = c["length"]
+    comps.Em = c["Em"]
+    comps.initVm = c["initVm"]
+    comps.Rm = c["RM"] / sarea
+    comps.Cm = c["CM"] * sarea
+    for settings, gbar, Ek in model.channels:
+        helpers.addChannelToComps({"settings": settings, "gbar": gbar, "Ek": Ek},
+                comps, number, poolSettings=model.pool)
+    for syn in model.synapses:
+        for i in range(number):
+            comp = comps[i]
+            if syn.rate > 0:
+                seed = None if syn.seed is None else syn.seed + i
+                synapses.createPoissonSynapse(comp, syn.name, syn.Ek, syn.rate,
+                        syn.numInputs, syn.simtime, syn.refractT, seed,
+                        syn.gbar, syn.tau1, syn.tau2)
+            else:
+                synapses.createSynapse(comp, syn.name, 1, syn.Ek, syn.gbar,
+                        syn.tau1, syn.tau2)
+    for j, stim in enumerate(model.stimuli):
+        pulses = moose.vec("%s/stimulus%d_%s" % (container, j, comps.name),
+                n=number, dtype="PulseGen")
+        pulses.firstDelay = stim.delay
+        pulses.firstWidth = stim.width
+        pulses.firstLevel = stim.level
+        pulses.secondDelay = 1e9
+        moose.connect(pulses, "output", comps, "injectMsg", "OneToOne")
+    _built[path] = (model.key, number)
+    return comps
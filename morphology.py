@@ -0,0 +1,414 @@
+import collections
+
+import numpy as np
+
+import cache
+
+#: One row per traced sample. Coordinates and radius are in microns as
+#: written in the file; parent is the SWC id of the parent sample (-1
+#: for the root).
+SWC_DTYPE = np.dtype([
+    ("id", np.int32),
+    ("type", np.int16),
+    ("xyz", np.float64, (3,)),
+    ("radius", np.float64),
+    ("parent", np.int32),
+    ])
+
+def parse_swc(data):
+    """Parse the text of an SWC file into a SWC_DTYPE array.
+
+    Parameters
+    ----------
+    data : bytes
+        contents of the file
+
+    Returns
+    -------
+    samples : numpy.ndarray
+        structured array with one row per sample
+    """
+    if b"#" in data:
+        data = b"\n".join(line for line in data.splitlines()
+                if not line.lstrip().startswith(b"#"))
+    values = np.array(data.split(), dtype=np.float64)
+    if values.size % 7:
+        raise ValueError("SWC data is not a multiple of 7 columns")
+    values = values.reshape(-1, 7)
+    samples = np.empty(len(values), dtype=SWC_DTYPE)
+    samples["id"] = values[:, 0]
+    samples["type"] = values[:, 1]
+    samples["xyz"] = values[:, 2:5]
+    samples["radius"] = values[:, 5]
+    samples["parent"] = values[:, 6]
+    return samples
+
+def read_swc(fileName, use_cache=True):
+    """Read an SWC morphology into a SWC_DTYPE array.
+
+    The parsed array is stored in the cache directory keyed on the sha1
+    of the file contents, and reads of the same file return a read-only
+    memory map of it instead of parsing again. The first read returns
+    the same memory map, so callers see a read-only array either way
+    (use_cache=False gives a writable one).
+
+    Parameters
+    ----------
+    fileName : str
+        path of the *.swc file
+    use_cache : bool
+        look up and store the parsed array in the cache
+
+    Returns
+    -------
+    samples : numpy.ndarray
+        structured array with one row per sample
+    """
+    with open(fileName, "rb") as f:
+        data = f.read()
+    if not use_cache:
+        return parse_swc(data)
+    path = cache.cache_path("swc", cache.bytes_digest(data))
+    try:
+        return np.load(path, mmap_mode="r")
+    except (IOError, OSError, ValueError):
+        pass
+    cache.atomic_save(path, np.save, parse_swc(data))
+    return np.load(path, mmap_mode="r")
+
+#: A parsed GENESIS cell parameter file: samples as in SWC_DTYPE (ids
+#: numbered from 1 in file order, absolute coordinates), the compartment
+#: names, the *set_global constants and whether the compartments are
+#: symmetric.
+GenesisCell = collections.namedtuple("GenesisCell",
+        ["samples", "names", "constants", "symmetric"])
+
+#: SWC type of a GENESIS compartment, guessed from its name prefix
+P_TYPES = (("soma", 1), ("axon", 2), ("basal", 3), ("dend", 3), ("apical", 4))
+
+def _p_lines(data):
+    """Lines of a .p file with // and /* */ comments removed."""
+    inComment = False
+    for line in data.decode("ascii", "replace").splitlines():
+        text = ""
+        while line:
+            if inComment:
+                end = line.find("*/")
+                if end < 0:
+                    line = ""
+                else:
+                    inComment = False
+                    line = line[end + 2:]
+                continue
+            start = line.find("/*")
+            slashes = line.find("//")
+            if slashes >= 0 and (start < 0 or slashes < start):
+                text += line[:slashes]
+                line = ""
+            elif start >= 0:
+                text += line[:start]
+                inComment = True
+                line = line[start + 2:]
+            else:
+                text += line
+                line = ""
+        if text.strip():
+            yield text.split()
+
+def _p_type(name):
+    for prefix, swcType in P_TYPES:
+        if name.startswith(prefix):
+            return swcType
+    return 0
+
+def parse_p(data):
+    """Parse the text of a GENESIS cell parameter (*.p) file.
+
+    Supports *relative/*absolute and *cartesian coordinates,
+    *symmetric/*asymmetric compartments and *set_global. Lines give
+    name, parent (or "none"), x, y, z and diameter in microns; polar
+    coordinates and per-compartment channel densities are not supported.
+
+    Parameters
+    ----------
+    data : bytes
+        contents of the file
+
+    Returns
+    -------
+    cell : GenesisCell
+    """
+    relative = False
+    symmetric = False
+    constants = {}
+    names = []
+    rows = []
+    index = {}
+    for fields in _p_lines(data):
+        if fields[0].startswith("*"):
+            option = fields[0]
+            if option == "*relative":
+                relative = True
+            elif option == "*absolute":
+                relative = False
+            elif option == "*symmetric":
+                symmetric = True
+            elif option == "*asymmetric":
+                symmetric = False
+            elif option == "*cartesian":
+                pass
+            elif option == "*set_global" and len(fields) == 3:
+                constants[fields[1]] = float(fields[2])
+            else:
+                raise ValueError("unsupported .p option %r" % " ".join(fields))
+            continue
+        if len(fields) != 6:
+            raise ValueError("expected name, parent, x, y, z, diameter in %r"
+                    % " ".join(fields))
+        name, parentName = fields[:2]
+        xyz = np.array(fields[2:5], dtype=np.float64)
+        if name in index:
+            raise ValueError("compartment %r defined twice" % name)
+        if parentName == "none":
+            parent = -1
+        elif parentName in index:
+            parent = index[parentName]
+            if relative:
+                xyz += rows[parent][1]
+        else:
+            raise ValueError("parent %r of %r is not defined before it"
+                    % (parentName, name))
+        index[name] = len(rows)
+        names.append(name)
+        rows.append((parent, xyz, float(fields[5])))
+    samples = np.empty(len(rows), dtype=SWC_DTYPE)
+    samples["id"] = np.arange(1, len(rows) + 1)
+    samples["type"] = [_p_type(name) for name in names]
+    samples["xyz"] = [xyz for parent, xyz, dia in rows] if rows else np.empty((0, 3))
+    samples["radius"] = [dia / 2.0 for parent, xyz, dia in rows]
+    samples["parent"] = [parent + 1 if parent >= 0 else -1 for parent, xyz, dia in rows]
+    return GenesisCell(samples, names, constants, symmetric)
+
+def _save_p(f, cell):
+    np.savez(f, samples=cell.samples, names=np.array(cell.names),
+            constantNames=np.array(sorted(cell.constants)),
+            constantValues=np.array([cell.constants[k] for k in sorted(cell.constants)],
+                dtype=np.float64),
+            symmetric=np.array(cell.symmetric))
+
+def read_p(fileName, use_cache=True):
+    """Read a GENESIS cell parameter file into a GenesisCell, cached
+    like read_swc on the sha1 of the file contents.
+
+    Parameters
+    ----------
+    fileName : str
+        path of the *.p file
+    use_cache : bool
+        look up and store the parsed cell in the cache
+
+    Returns
+    -------
+    cell : GenesisCell
+    """
+    with open(fileName, "rb") as f:
+        data = f.read()
+    if not use_cache:
+        return parse_p(data)
+    path = cache.cache_path("p", cache.bytes_digest(data), ".npz")
+    try:
+        with np.load(path) as saved:
+            return GenesisCell(saved["samples"], saved["names"].tolist(),
+                    dict(zip(saved["constantNames"].tolist(),
+                        saved["constantValues"].tolist())),
+                    bool(saved["symmetric"]))
+    except (IOError, OSError, ValueError, KeyError):
+        pass
+    cell = parse_p(data)
+    cache.atomic_save(path, _save_p, cell)
+    return cell
+
+def parent_indices(samples):
+    """Row index of each sample's parent, -1 for roots."""
+    ids = samples["id"]
+    order = np.argsort(ids, kind="mergesort")
+    pos = np.searchsorted(ids, samples["parent"], sorter=order)
+    pos = np.minimum(pos, len(ids) - 1)
+    pidx = order[pos]
+    missing = ids[pidx] != samples["parent"]
+    pidx[missing] = -1
+    return pidx
+
+def compartment_geometry(samples, origin=None):
+    """Length and diameter (in meters) of the compartment each sample
+    makes with its parent.
+
+    Roots, and samples sitting on top of their parent, are treated as
+    spheres with length equal to their diameter. With an `origin` (in
+    microns) roots are instead cylinders from that point, as GENESIS
+    measures them; a root at the origin is still a sphere.
+
+    Returns
+    -------
+    length, diameter : numpy.ndarray
+    """
+    xyz = samples["xyz"]
+    pidx = parent_indices(samples)
+    start = xyz[pidx]
+    cylinder = pidx >= 0
+    if origin is not None:
+        start[~cylinder] = origin
+        cylinder[:] = True
+    length = np.sqrt(((xyz - start) ** 2).sum(axis=1))
+    diameter = 2e-6 * samples["radius"]
+    length = np.where(cylinder & (length > 0), 1e-6 * length, diameter)
+    return length, diameter
+
+#: Compartments made from a sample tree by discretize: parent row index
+#: (-1 for roots), length and diameter in meters, the compartment each
+#: sample went into, and samples per compartment
+Compartments = collections.namedtuple("Compartments",
+        ["parent", "length", "diameter", "compartment", "reduction"])
+
+def lambda_f(diameter, frequency, RA, CM):
+    """AC length constant (m) of a cylinder of `diameter` (m) at
+    `frequency` (Hz), as used by NEURON's d_lambda rule."""
+    return np.sqrt(diameter / (4 * np.pi * frequency * RA * CM))
+
+def chain_sum(values, pidx, start):
+    """Sum of `values` from each node up to and including the nearest
+    ancestor-or-self with `start` set, by pointer jumping."""
+    total = np.array(values, dtype=np.float64)
+    ptr = np.where(start, -1, pidx)
+    active = ptr >= 0
+    while active.any():
+        idx = np.nonzero(active)[0]
+        p = ptr[idx]
+        total[idx] += total[p]
+        ptr[idx] = ptr[p]
+        active = ptr >= 0
+    return total
+
+def chain_head(pidx, start):
+    """Nearest ancestor-or-self of each node with `start` set."""
+    head = np.where(start, np.arange(len(pidx)), pidx)
+    while True:
+        nxt = head[head]
+        if (nxt == head).all():
+            return head
+        head = nxt
+
+#: Compartment name prefix of each SWC type, as MOOSE's SWC reader uses
+SWC_NAMES = {1: "soma", 2: "axon", 3: "dend", 4: "apical"}
+
+def compartment_names(samples):
+    """Name of the compartment each sample makes, in the scheme of
+    MOOSE's SWC reader: "soma" (then "soma_1", ...) for the soma, and
+    "<type>_<branch>_<segment>" elsewhere, branches being the unbranched
+    runs of one type numbered in file order (e.g. "dend_3_0")."""
+    pidx = parent_indices(samples)
+    types = samples["type"]
+    safe = np.where(pidx < 0, 0, pidx)
+    children = np.bincount(pidx[pidx >= 0], minlength=len(pidx))
+    soma = types == 1
+    start = (pidx < 0) | soma | soma[safe] | (children[safe] > 1) | (types != types[safe])
+    head = chain_head(pidx, start)
+    branch = np.searchsorted(np.nonzero(start & ~soma)[0], head)
+    segment = chain_sum(np.ones(len(pidx)), pidx, start).astype(np.intp) - 1
+    somaRank = np.cumsum(soma) - 1
+    names = []
+    for i, t in enumerate(types.tolist()):
+        if t == 1:
+            names.append("soma_%d" % somaRank[i] if somaRank[i] else "soma")
+        else:
+            names.append("%s_%d_%d" % (SWC_NAMES.get(t, "dend"), branch[i], segment[i]))
+    return names
+
+def discretize(samples, RM, RA, CM, d_lambda=0.1, frequency=100.0, origin=None):
+    """Merge runs of unbranched samples into compartments no longer
+    than `d_lambda` of the AC length constant at `frequency`.
+
+    Each section (a chain of samples from a root, branch point or change
+    of SWC type up to the next one) is cut into the fewest equal pieces
+    of electrotonic length at most `d_lambda`, and every sample goes
+    into the piece holding its midpoint. Roots stay compartments of
+    their own. A merged compartment is the cylinder with the same
+    membrane area and axial resistance as its samples, so Rm, Cm and
+    Ra from passive_properties are unchanged in total.
+
+    Parameters
+    ----------
+    samples : numpy.ndarray
+        SWC_DTYPE array (read_swc, or read_p(...).samples)
+    RM, RA, CM : float
+        specific membrane resistance (ohm*m^2), axial resistance (ohm*m)
+        and membrane capacitance (F/m^2)
+    d_lambda : float
+        largest compartment length as a fraction of lambda_f
+    frequency : float
+        frequency (Hz) at which lambda_f is computed
+    origin : sequence of float, optional
+        passed to compartment_geometry
+
+    Returns
+    -------
+    compartments : Compartments
+    """
+    length, diameter = compartment_geometry(samples, origin)
+    pidx = parent_indices(samples)
+    n = len(samples)
+    root = pidx < 0
+    safe = np.where(root, 0, pidx)
+    children = np.bincount(pidx[~root], minlength=n)
+    start = (root | root[safe] | (children[safe] > 1)
+            | (samples["type"] != samples["type"][safe]))
+    electrotonic = length / lambda_f(diameter, frequency, RA, CM)
+    distance = chain_sum(electrotonic, pidx, start)
+    head = chain_head(pidx, start)
+    # a section is a chain, so its total is the largest distance in it
+    total = np.zeros(n)
+    np.maximum.at(total, head, distance)
+    total = total[head]
+    pieces = np.maximum(np.ceil(total / d_lambda - 1e-9), 1)
+    piece = np.floor((distance - electrotonic / 2) / (total / pieces))
+    piece = np.where(root, 0, np.clip(piece, 0, pieces - 1)).astype(np.int64)
+    keys, compartment = np.unique(head.astype(np.int64) * n + piece, return_inverse=True)
+    compartment = compartment.ravel()
+    count = len(keys)
+    area = np.bincount(compartment, np.pi * diameter * length, count)
+    axial = np.bincount(compartment, 4 * length / (np.pi * diameter ** 2), count)
+    # pi*d*L = area and 4*L/(pi*d^2) = axial give d^3 = 4*area/(pi^2*axial)
+    cdiameter = np.cbrt(4 * area / (np.pi ** 2 * axial))
+    clength = area / (np.pi * cdiameter)
+    parent = np.full(count, -1, dtype=np.intp)
+    first = root | (compartment[safe] != compartment)
+    first &= ~root
+    parent[compartment[first]] = compartment[pidx[first]]
+    return Compartments(parent, clength, cdiameter, compartment, float(n) / count)
+
+def passive_properties(length, diameter, RM, RA, CM):
+    """Absolute Rm, Cm and Ra of cylindrical compartments.
+
+    Parameters
+    ----------
+    length, diameter : numpy.ndarray
+        compartment dimensions in meters
+    RM : float
+        specific membrane resistance (ohm*m^2)
+    RA : float
+        specific axial resistance (ohm*m)
+    CM : float
+        specific membrane capacitance (F/m^2)
+
+    Returns
+    -------
+    Rm, Cm, Ra : numpy.ndarray
+    """
+    diameter = np.asarray(diameter, dtype=np.float64)
+    # zero-length compartments (somata from loadModel) are spheres, as
+    # in compartment_geometry
+    length = np.asarray(length, dtype=np.float64)
+    length = np.where(length > 0, length, diameter)
+    sarea = np.pi * diameter * length
+    xarea = np.pi * diameter * diameter / 4.0
+    return RM / sarea, CM * sarea, RA * length / xarea
@@ -0,0 +1,124 @@
+"""Networks of neurons wired from a sparse connectivity matrix.
+
+Connectivity is given in CSR form with one row per presynaptic neuron:
+the targets of neuron i are indices[indptr[i]:indptr[i+1]], with the
+matching weights and delays. connect_network turns it into MOOSE
+elements using one vec per element type, a single SparseMsg filled
+from index arrays and one call per synapse field, so the Python work
+does not grow with the number of neurons or synapses.
+"""
+import collections
+
+import numpy as np
+
+from backends import moose
+
+Network = collections.namedtuple("Network", [
+    "comps",        # compartment vec, one per neuron
+    "spikegens",    # SpikeGen vec detecting spikes in each neuron
+    "synchans",     # SynChan vec, one per neuron
+    "handlers",     # SimpleSynHandler vec, one per neuron
+    "msg"           # SparseMsg from spikegens to synapses
+    ])
+
+def random_connectivity(number, probability, weight=1.0, delay=5e-3,
+        delaySpread=0.0, seed=None):
+    """Random CSR connectivity without self-connections.
+
+    Parameters
+    ----------
+    number : int
+        number of neurons
+    probability : float
+        connection probability of each ordered pair
+    weight : float
+        weight of every synapse
+    delay, delaySpread : float
+        delays are uniform in delay +/- delaySpread (s)
+
+    Returns
+    -------
+    indptr, indices, weights, delays : numpy.ndarray
+    """
+    rng = np.random.RandomState(seed)
+    counts = rng.binomial(number - 1, probability, size=number)
+    indptr = np.r_[0, np.cumsum(counts)]
+    pre = np.repeat(np.arange(number), counts)
+    # draw targets among the other number-1 neurons, skipping self
+    indices = (rng.randint(0, number - 1, size=indptr[-1]))
+    indices += indices >= pre
+    # duplicates are allowed: they act as one stronger synapse
+    order = np.lexsort((indices, pre))
+    indices = indices[order]
+    weights = np.full(len(indices), weight, dtype=np.float64)
+    delays = delay + rng.uniform(-delaySpread, delaySpread, size=len(indices))
+    return indptr, indices, weights, np.maximum(delays, 0.0)
+
+def synapse_slots(indptr, indices, number):
+    """For each connection, the presynaptic neuron and the synapse
+    index it occupies on its postsynaptic handler.
+
+    Returns
+    -------
+    pre, slot : numpy.ndarray
+        per connection, in CSR order
+    counts : numpy.ndarray
+        number of synapses on each postsynaptic neuron
+    """
+    indptr = np.asarray(indptr)
+    indices = np.asarray(indices)
+    pre = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+    order = np.argsort(indices, kind="mergesort")
+    counts = np.bincount(indices, minlength=number)
+    starts = np.r_[0, np.cumsum(counts)[:-1]]
+    slot = np.empty(len(indices), dtype=np.intp)
+    slot[order] = np.arange(len(indices)) - starts[indices[order]]
+    return pre, slot, counts
+
+def connect_network(comps, indptr, indices, weights, delays, name="syn",
+        Ek=0, gbar=1e-9, tau1=1e-3, tau2=5e-3, threshold=0.0, refractT=1e-3):
+    """Wire the neurons in `comps` with the given CSR connectivity.
+
+    Parameters
+    ----------
+    comps : moose.vec
+        one compartment per neuron, e.g. create_1comp_neuron(path, N)
+    indptr, indices, weights, delays : numpy.ndarray
+        CSR connectivity, rows are presynaptic neurons
+    name : str
+        prefix of the created elements
+    Ek, gbar, tau1, tau2 : float
+        SynChan parameters, shared by every neuron
+    threshold, refractT : float
+        SpikeGen parameters
+
+    Returns
+    -------
+    network : Network
+    """
+    number = len(comps)
+    container = comps[0].parent.path + "/" + name
+    spikegens = moose.vec(container + "spike", n=number, dtype="SpikeGen")
+    spikegens.threshold = threshold
+    spikegens.refractT = refractT
+    moose.connect(comps, "VmOut", spikegens, "Vm", "OneToOne")
+    synchans = moose.vec(container + "synchan", n=number, dtype="SynChan")
+    synchans.Gbar = gbar
+    synchans.tau1 = tau1
+    synchans.tau2 = tau2
+    synchans.Ek = Ek
+    moose.connect(comps, "channel", synchans, "channel", "OneToOne")
+    handlers = moose.vec(container + "synhandler", n=number, dtype="SimpleSynHandler")
+    moose.connect(handlers, "activationOut", synchans, "activation", "OneToOne")
+    pre, slot, counts = synapse_slots(indptr, indices, number)
+    handlers.numSynapses = counts
+    synapses = moose.vec(handlers.path + "/synapse")
+    msg = moose.connect(spikegens, "spikeOut", synapses, "addSpike", "Sparse")
+    msg.tripletFill(pre.tolist(), np.asarray(indices).tolist(), slot.tolist())
+    # setting a field on the synapse vec walks every handler's synapses
+    # in turn, handler 0 first, so weights and delays go in one call each
+    # once sorted by (postsynaptic neuron, slot)
+    order = np.lexsort((slot, indices))
+    synapses.weight = np.asarray(weights, dtype=np.float64)[order]
+    synapses.delay = np.asarray(delays, dtype=np.float64)[order]
+    return Network(comps, spikegens, synchans, handlers, msg)
@@ -0,0 +1,186 @@
+import collections
+
+import numpy as np
+
+from backends import pyplot as plt
+
+#: Shared time axes, by (dt, size)
+_time_bases = {}
+
+def time_base(dt, size):
+    """Read-only array of sample times 0, dt, ..., (size-1)*dt, shared
+    between every caller asking for the same dt and size."""
+    key = (float(dt), int(size))
+    t = _time_bases.get(key)
+    if t is None:
+        t = np.arange(key[1]) * key[0]
+        t.flags.writeable = False
+        _time_bases[key] = t
+    return t
+
+#: Traces longer than this many samples per horizontal pixel are drawn
+#: from a min/max decimation pyramid instead of in full
+DECIMATE_RATIO = 4
+
+class Pyramid(object):
+    """Per-block minima and maxima of a trace at successively coarser
+    block sizes (1, factor, factor**2, ...), built once and reused for
+    every redraw and zoom level."""
+    def __init__(self, values, factor=4, smallest=1024):
+        values = np.asarray(values, dtype=np.float64)
+        self.size = len(values)
+        self.factor = factor
+        self.levels = [(values, values)]
+        lo = hi = values
+        while len(lo) > smallest:
+            starts = np.arange(0, len(lo), factor)
+            lo = np.minimum.reduceat(lo, starts)
+            hi = np.maximum.reduceat(hi, starts)
+            self.levels.append((lo, hi))
+
+    def decimate(self, dt, start, stop, npoints):
+        """Envelope of samples start..stop with at most about 2*npoints
+        vertices: each block contributes its min and its max.
+
+        Returns
+        -------
+        x, y : numpy.ndarray
+        """
+        start = max(0, int(start))
+        stop = min(self.size, int(stop))
+        level = 0
+        while (level + 1 < len(self.levels) and
+                (stop - start) // self.factor ** (level + 1) >= npoints):
+            level += 1
+        block = self.factor ** level
+        lo, hi = self.levels[level]
+        j0 = start // block
+        j1 = -(-stop // block)
+        x = np.arange(j0, j1) * (block * dt)
+        if level == 0:
+            return x, lo[j0:j1]
+        return np.repeat(x, 2), np.column_stack((lo[j0:j1], hi[j0:j1])).ravel()
+
+#: Pyramids of recently plotted tables, by (path, dt, size), least
+#: recently used first
+_pyramids = collections.OrderedDict()
+
+#: How many pyramids _pyramids keeps
+PYRAMID_CACHE_SIZE = 16
+
+def pyramid(values, key=None):
+    """Pyramid for `values`, reused from the cache when `key` names a
+    trace that was already plotted with the same contents.
+
+    A cached pyramid owns a copy of its trace as level 0, so it does not
+    keep the caller's array alive, and that copy is compared with
+    `values` to tell whether the trace changed anywhere.
+    """
+    if key is None:
+        return Pyramid(values)
+    values = np.asarray(values, dtype=np.float64)
+    cached = _pyramids.pop(key, None)
+    if cached is None or not np.array_equal(cached.levels[0][0], values):
+        cached = Pyramid(values.copy())
+    _pyramids[key] = cached
+    while len(_pyramids) > PYRAMID_CACHE_SIZE:
+        _pyramids.popitem(last=False)
+    return cached
+
+def _pixel_width(ax):
+    try:
+        return max(100, int(ax.bbox.width))
+    except (AttributeError, ValueError):
+        return 2000
+
+class _Redecimate(object):
+    """Recomputes the decimated lines of an axes when its x range
+    changes, so zooming in reveals full detail."""
+    def __init__(self, ax, dt, lines, pyramids):
+        self.dt = dt
+        self.lines = lines
+        self.pyramids = pyramids
+        ax.callbacks.connect("xlim_changed", self)
+
+    def __call__(self, ax):
+        x0, x1 = ax.get_xlim()
+        start = int(np.floor(x0 / self.dt))
+        stop = int(np.ceil(x1 / self.dt)) + 1
+        npoints = _pixel_width(ax)
+        for line, pyr in zip(self.lines, self.pyramids):
+            line.set_data(*pyr.decimate(self.dt, start, stop, npoints))
+
+def plot_traces(dt, traces, labels=None, ax=None, keys=None, decimate=True):
+    """Plot the rows of a 2-D array sampled every `dt` in one call.
+
+    Long traces are drawn from a min/max pyramid at roughly one block
+    per pixel, and redrawn at finer levels when the view is zoomed.
+    `keys` (one per row) lets the pyramids be cached between calls.
+    """
+    if ax is None:
+        ax = plt.gca()
+    traces = np.atleast_2d(traces)
+    size = traces.shape[1]
+    npoints = _pixel_width(ax)
+    if not decimate or size <= DECIMATE_RATIO * npoints:
+        lines = ax.plot(time_base(dt, size), traces.T)
+    else:
+        if keys is None:
+            keys = [None] * len(traces)
+        pyramids = [pyramid(row, key) for row, key in zip(traces, keys)]
+        lines = []
+        for pyr in pyramids:
+            lines += ax.plot(*pyr.decimate(dt, 0, size, npoints))
+        ax.set_xlim(0, (size - 1) * dt)
+        _Redecimate(ax, dt, lines, pyramids)
+    if labels is not None:
+        for line, label in zip(lines, labels):
+            line.set_label(label)
+    return lines
+
+def _axes(ax, clear):
+    if ax is None:
+        if clear:
+            plt.clf()
+        return plt.gca()
+    if clear:
+        ax.cla()
+    return ax
+
+def plot_tables(tables, ax=None, show=False, clear=False):
+    """Plot moose tables against time, labelled with their paths.
+
+    Tables with the same dt and size are stacked into one 2-D array and
+    drawn with a single plot call over a shared time axis. `clear`
+    empties the figure (or `ax`) first; `show` calls pyplot.show after.
+    """
+    ax = _axes(ax, clear)
+    groups = {}
+    for table in tables:
+        groups.setdefault((table.dt, table.size), []).append(table)
+    lines = []
+    for (dt, size), group in groups.items():
+        traces = np.empty((len(group), size))
+        for row, table in zip(traces, group):
+            row[:] = table.vector
+        paths = [table.path for table in group]
+        keys = [(path, dt, size) for path in paths]
+        lines += plot_traces(dt, traces, paths, ax, keys)
+    if show:
+        plt.show()
+    return lines
+
+def plot_table(table, ax=None, show=False, clear=False):
+    return plot_tables([table], ax, show, clear)
+
+def plot_spike_tables(tables, ax=None, show=False, clear=False):
+    """Raster plot of spike-time tables, one row per table, labelled
+    with the table's path."""
+    ax = _axes(ax, clear)
+    lines = []
+    for i, table in enumerate(tables):
+        x = np.asarray(table.vector)
+        lines += ax.plot(x, np.full(len(x), i), "o", label=table.path)
+    if show:
+        plt.show()
+    return lines
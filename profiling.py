@@ -0,0 +1,185 @@
+"""Per-phase timing of model building, reinit, running and plotting.
+
+A Profiler times named phases entered with `with profiler.phase(name)`.
+It can also profile each phase with cProfile and record the Python
+memory it allocates with tracemalloc. instrumented() wraps helper
+functions (addChannelToComps, add_calcium, ...) for the length of a with
+block, so every call is counted as its own phase. Phases nest: "wall"
+and "cpu" include the phases entered inside, "exclusive" is the wall
+time of the phase itself, and the exclusive times add up to the time
+spent in phases. report() returns a dict and save() writes it as JSON.
+
+    profiler = profiling.Profiler("hw9", cprofile=True)
+    with profiling.instrumented(helpers, ["add_calcium"], profiler):
+        with profiler.phase("build"):
+            comp = hw9.create_1comp_neuron("/model/neuron")
+    with profiler.phase("reinit"):
+        moose.reinit()
+    with profiler.phase("run"):
+        moose.start(simtime)
+    profiler.save("hw9-profile.json")
+"""
+import contextlib
+import functools
+import io
+import json
+import os
+import resource
+import sys
+import time
+
+try:
+    import cProfile
+    import pstats
+except ImportError:
+    cProfile = None
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+def maxrss():
+    """Peak resident set size of this process in bytes."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return rss if sys.platform == "darwin" else rss * 1024
+
+def _top_functions(profile, count):
+    stats = pstats.Stats(profile, stream=io.StringIO())
+    rows = []
+    for (fileName, line, func), (cc, nc, tt, ct, callers) in stats.stats.items():
+        rows.append({"function": "%s:%d(%s)" % (os.path.basename(fileName), line, func),
+                "calls": nc, "tottime": tt, "cumtime": ct})
+    rows.sort(key=lambda r: r["cumtime"], reverse=True)
+    return rows[:count]
+
+class Profiler(object):
+    """Collects wall time, CPU time and optionally cProfile and
+    tracemalloc data for named phases.
+
+    Parameters
+    ----------
+    name : str
+        name of the run, copied into the report
+    cprofile : bool
+        run cProfile in each outermost phase and keep its top functions
+        over all calls of the phase
+    memory : bool
+        record the Python memory allocated by each phase (tracemalloc)
+    top : int
+        number of functions kept from each cProfile phase
+    """
+    def __init__(self, name="run", cprofile=False, memory=False, top=20):
+        self.name = name
+        self.cprofile = cprofile and cProfile is not None
+        self.memory = memory and tracemalloc is not None
+        self.top = top
+        self.phases = {}
+        #: one cProfile.Profile per phase, accumulating over its calls
+        self.profiles = {}
+        self.order = []
+        self.stack = []
+        self.started = time.time()
+
+    def _entry(self, name):
+        entry = self.phases.get(name)
+        if entry is None:
+            entry = self.phases[name] = {"calls": 0, "wall": 0.0, "cpu": 0.0,
+                    "exclusive": 0.0}
+            self.order.append(name)
+        return entry
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Time the body of the with block as phase `name`. Phases may
+        nest, and entering a phase again adds to its totals; a phase
+        entered inside itself is only counted once in "wall" and "cpu"."""
+        entry = self._entry(name)
+        outermost = not self.stack
+        reentered = any(frame[0] == name for frame in self.stack)
+        profile = None
+        if self.cprofile and outermost:
+            profile = self.profiles.get(name)
+            if profile is None:
+                profile = self.profiles[name] = cProfile.Profile()
+        if self.memory and outermost:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        #: [name, wall time of the phases nested in this one]
+        frame = [name, 0.0]
+        self.stack.append(frame)
+        wall = time.time()
+        cpu = time.process_time()
+        if profile is not None:
+            profile.enable()
+        try:
+            yield entry
+        finally:
+            if profile is not None:
+                profile.disable()
+            elapsed = time.time() - wall
+            if not reentered:
+                entry["wall"] += elapsed
+                entry["cpu"] += time.process_time() - cpu
+            entry["exclusive"] += elapsed - frame[1]
+            entry["calls"] += 1
+            self.stack.pop()
+            if self.stack:
+                self.stack[-1][1] += elapsed
+            entry["maxrss"] = maxrss()
+            if profile is not None:
+                entry["profile"] = _top_functions(profile, self.top)
+            if self.memory and outermost:
+                current, peak = tracemalloc.get_traced_memory()
+                entry["allocated"] = entry.get("allocated", 0) + current - before
+                entry["peakAllocated"] = max(entry.get("peakAllocated", 0), peak - before)
+
+    def report(self):
+        """The collected data as a JSON-serializable dict; phases are
+        listed in the order they were first entered."""
+        return {
+            "name": self.name,
+            "started": self.started,
+            "total": time.time() - self.started,
+            "maxrss": maxrss(),
+            "phases": [dict(self.phases[name], name=name) for name in self.order],
+            }
+
+    def save(self, fileName):
+        tmp = "%s.%d.tmp" % (fileName, os.getpid())
+        with open(tmp, "w") as f:
+            json.dump(self.report(), f, indent=2)
+        os.rename(tmp, fileName)
+
+def timed(profiler, name, func):
+    """`func` wrapped so every call is a phase `name` of `profiler`."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with profiler.phase(name):
+            return func(*args, **kwargs)
+    return wrapper
+
+def instrument(module, names, profiler):
+    """Replace the functions `names` of `module` by timed versions, so
+    calls made from inside the module are timed too. Returns a callable
+    that puts the originals back."""
+    originals = dict((name, getattr(module, name)) for name in names)
+    for name, func in originals.items():
+        setattr(module, name, timed(profiler, name, func))
+    def restore():
+        for name, func in originals.items():
+            setattr(module, name, func)
+    return restore
+
+@contextlib.contextmanager
+def instrumented(module, names, profiler):
+    """instrument() for the body of a with block only; the originals
+    are put back however the block exits."""
+    restore = instrument(module, names, profiler)
+    try:
+        yield
+    finally:
+        restore()
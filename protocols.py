@@ -0,0 +1,94 @@
+"""Current-step (F-I / I-V) protocols run for many amplitudes at once.
+
+Instead of one current_step_test per amplitude, every amplitude gets
+its own replica of the neuron (one entry of a compartment vec, or one
+row of the NumPy engine), and the whole family of steps is a single run.
+"""
+import collections
+
+import numpy as np
+
+import hhsim
+import spikes
+from backends import moose
+
+FIResult = collections.namedtuple("FIResult", [
+    "levels",       # injected current of each replica (A)
+    "rate",         # firing rate during the step (Hz)
+    "latency",      # time from step onset to first spike (s), nan if none
+    "steadyVm",     # mean Vm over the last `steadyFraction` of the step (V)
+    "ts",           # sample times (s)
+    "vm"            # Vm traces, one row per level
+    ])
+
+def analyze_steps(levels, ts, vm, delay, width, threshold=0.0,
+        steadyFraction=0.25):
+    """Firing rate, latency and steady-state Vm of every row of `vm`.
+
+    Returns
+    -------
+    result : FIResult
+    """
+    vm = np.atleast_2d(vm)
+    during = (ts >= delay) & (ts < delay + width)
+    rows, cols = spikes.threshold_crossings(vm, threshold)
+    inStep = during[cols]
+    rows = rows[inStep]
+    cols = cols[inStep]
+    count = np.bincount(rows, minlength=len(vm))
+    # crossings are sorted by row then sample: the first of each row
+    first = np.r_[0, np.cumsum(count)[:-1]]
+    latency = np.full(len(vm), np.nan)
+    latency[count > 0] = ts[cols[first[count > 0]]] - delay
+    steady = during & (ts >= delay + width * (1.0 - steadyFraction))
+    steadyVm = vm[:, steady].mean(axis=1)
+    return FIResult(np.asarray(levels), count / float(width), latency,
+            steadyVm, ts, vm)
+
+def fi_curve(levels, simtime=0.1, simdt=0.25e-5, plotdt=0.25e-4,
+        delay=20e-3, width=40e-3, threshold=0.0, build=hhsim.create_1comp_neuron):
+    """Run a current step of every amplitude in `levels` in one go on the
+    NumPy engine.
+
+    Parameters
+    ----------
+    levels : sequence of float
+        step amplitudes (A)
+    build : callable
+        build(number) returns hhsim.Compartments with `number` replicas
+
+    Returns
+    -------
+    result : FIResult
+    """
+    comps = build(len(levels))
+    comps.reinit()
+    ts, traces = comps.run(simtime, simdt, plotdt,
+            stimulus=hhsim.pulse(delay, width, np.asarray(levels, dtype=np.float64)))
+    return analyze_steps(levels, ts, traces["Vm"], delay, width, threshold)
+
+def fi_curve_moose(create_1comp_neuron, levels, simtime=0.1, simdt=0.25e-5,
+        plotdt=0.25e-4, delay=20e-3, width=40e-3, threshold=0.0,
+        path="/fi"):
+    """MOOSE version of fi_curve: create_1comp_neuron(path, number=N)
+    builds one replica per level, each driven by its own entry of a
+    PulseGen vec and recorded by its own entry of a Table vec."""
+    number = len(levels)
+    moose.Neutral(path)
+    comps = create_1comp_neuron(path + "/neuron", number=number)
+    pulses = moose.vec(path + "/stimulus", n=number, dtype="PulseGen")
+    pulses.firstDelay = delay
+    pulses.firstWidth = width
+    pulses.firstLevel = np.asarray(levels, dtype=np.float64)
+    pulses.secondDelay = 1e9
+    moose.connect(pulses, "output", comps, "injectMsg", "OneToOne")
+    tables = moose.vec(path + "/Vm", n=number, dtype="Table")
+    moose.connect(tables, "requestOut", comps, "getVm", "OneToOne")
+    for i in range(10):
+        moose.setClock(i, simdt)
+    moose.setClock(8, plotdt)
+    moose.reinit()
+    moose.start(simtime)
+    vm = np.array([tables[i].vector for i in range(number)])
+    ts = np.arange(vm.shape[1]) * plotdt
+    return analyze_steps(levels, ts, vm, delay, width, threshold)
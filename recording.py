@@ -0,0 +1,107 @@
+"""Recordings that stream to disk instead of growing in memory.
+
+A Recorder owns a set of moose.Table objects like create_table makes.
+It runs the simulation in chunks, and after each chunk it copies every
+table into a preallocated .npy memmap and clears the table. Memory use
+is bounded by the chunk length whatever the run length. The files are
+plain .npy arrays, with a JSON index holding the time-base of each
+signal, and can be read back zero-copy with load().
+"""
+import json
+import os
+
+import numpy as np
+
+from backends import moose
+
+INDEX = "index.json"
+
+class Recorder(object):
+    """Stream moose tables into memory-mapped .npy files.
+
+    Parameters
+    ----------
+    directory : str
+        where the .npy files and index.json are written
+    simtime : float
+        total simulated time, used to size the files
+    chunk : float
+        simulated time between flushes
+    """
+    def __init__(self, directory, simtime, chunk=10e-3):
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.directory = directory
+        self.simtime = simtime
+        self.chunk = chunk
+        self.signals = {}
+
+    def record(self, tablename, tablecomp, compproperty):
+        """Create a table like create_table and stream it."""
+        tab = moose.Table(tablename)
+        moose.connect(tab,"requestOut",tablecomp,compproperty)
+        self.add(tab.name, tab)
+        return tab
+
+    def add(self, name, table):
+        self.signals[name] = {"table": table, "data": None, "size": 0}
+
+    def _open(self, name, signal):
+        table = signal["table"]
+        nsamples = int(round(self.simtime / table.dt)) + 2
+        signal["dt"] = table.dt
+        signal["data"] = np.lib.format.open_memmap(
+                os.path.join(self.directory, name + ".npy"),
+                mode="w+", dtype=np.float64, shape=(nsamples,))
+
+    def flush(self):
+        """Move everything recorded so far from the tables to disk."""
+        for name, signal in self.signals.items():
+            if signal["data"] is None:
+                self._open(name, signal)
+            values = signal["table"].vector
+            start = signal["size"]
+            stop = min(start + len(values), len(signal["data"]))
+            signal["data"][start:stop] = values[:stop - start]
+            signal["size"] = stop
+            signal["table"].clearVec()
+
+    def run(self):
+        """reinit and run for simtime, flushing every chunk."""
+        moose.reinit()
+        done = 0.0
+        while done < self.simtime:
+            step = min(self.chunk, self.simtime - done)
+            moose.start(step)
+            done += step
+            self.flush()
+        self.close()
+
+    def close(self):
+        index = {}
+        for name, signal in self.signals.items():
+            if signal["data"] is not None:
+                signal["data"].flush()
+            index[name] = {
+                    "file": name + ".npy",
+                    "path": signal["table"].path,
+                    "dt": signal.get("dt"),
+                    "size": signal["size"],
+                    }
+        with open(os.path.join(self.directory, INDEX), "w") as f:
+            json.dump(index, f, indent=1, sort_keys=True)
+
+def load(directory, name):
+    """Read back a recorded signal without copying it.
+
+    Returns
+    -------
+    dt : float
+        sampling interval
+    values : numpy.ndarray
+        read-only view of the samples in the memmapped file
+    """
+    with open(os.path.join(directory, INDEX)) as f:
+        entry = json.load(f)[name]
+    values = np.load(os.path.join(directory, entry["file"]), mmap_mode="r")
+    return entry["dt"], values[:entry["size"]]
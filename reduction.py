@@ -0,0 +1,169 @@
+"""Reduction of reconstructed cells to a few equivalent cylinders.
+
+A reduced cell has a spherical soma with the membrane area of the
+traced soma and, for every SWC type of dendrite hanging from it (basal,
+apical, axon, ...), one chain of cylinders. The dendrites of a type are
+cut at equal electrotonic distances from the soma; every piece becomes
+the cylinder with the membrane area of the traced membrane between those
+distances and the same electrotonic length, which is Rall's d^(3/2)
+rule where the tree obeys it. Specific RM and CM are kept, so the
+membrane time constant is unchanged, and the axial resistance of the
+cylinders is then scaled (at constant area) until the input resistance
+at the soma matches the full cell, as in the hand-made reductions of
+Bush and Sejnowski (1993) such as layer2.p.
+
+    reduced = reduction.reduce_cell(morphology.read_swc(fileName), RM, RA, CM)
+    cell = cable.Cell(reduced.parent, reduced.length, reduced.diameter, RM, RA, CM)
+    reduction.write_p("reduced.p", reduced, RM, RA, CM)
+"""
+import collections
+
+import numpy as np
+
+import cable
+import morphology
+from channels import EREST_ACT
+
+#: A reduced cell: compartment names, parent row index (-1 for the
+#: soma), length and diameter in meters, and the soma input resistance
+#: (ohm) of the reduced and of the full cell
+ReducedCell = collections.namedtuple("ReducedCell", ["names", "parent", "length",
+        "diameter", "inputResistance", "fullInputResistance"])
+
+#: Compartment name prefix of each SWC type
+TYPE_NAMES = {2: "axon", 3: "basal", 4: "apical"}
+
+#: Direction in which write_p lays out the cylinders of each SWC type
+TYPE_DIRECTIONS = {2: (1.0, 0.0, 0.0), 3: (0.0, -1.0, 0.0), 4: (0.0, 1.0, 0.0)}
+
+def length_constant(diameter, RM, RA):
+    """DC length constant (m) of a cylinder of `diameter` (m)."""
+    return np.sqrt(RM * diameter / (4 * RA))
+
+def input_resistance(parent, length, diameter, RM, RA, root=0):
+    """Steady-state input resistance (ohm) at compartment `root` of a
+    passive tree, from one Hines solve."""
+    Rm, Cm, Ra = morphology.passive_properties(length, diameter, RM, RA, 1.0)
+    solver = cable.HinesSolver(parent, 1.0 / Ra)
+    rhs = np.zeros(len(parent))
+    rhs[root] = 1.0
+    return solver.solve(1.0 / Rm, rhs)[root]
+
+def _scale_axial(length, diameter, factor):
+    """Cylinders with `factor` times the axial resistance and the same
+    membrane area."""
+    return length * factor ** (1 / 3.0), diameter * factor ** (-1 / 3.0)
+
+def reduce_cell(samples, RM, RA, CM, compartments=10, match=True):
+    """Reduce a traced cell to about `compartments` compartments.
+
+    Parameters
+    ----------
+    samples : numpy.ndarray
+        SWC_DTYPE array (morphology.read_swc); samples of type 1 are soma
+    RM, RA, CM : float
+        specific membrane resistance (ohm*m^2), axial resistance (ohm*m)
+        and membrane capacitance (F/m^2)
+    compartments : int
+        target size including the soma; the remaining compartments are
+        shared evenly between the dendrite types
+    match : bool
+        scale the axial resistance of the cylinders to give the input
+        resistance of the full cell
+
+    Returns
+    -------
+    reduced : ReducedCell
+    """
+    length, diameter = morphology.compartment_geometry(samples)
+    pidx = morphology.parent_indices(samples)
+    roots = np.nonzero(pidx < 0)[0]
+    if len(roots) != 1:
+        raise ValueError("expected one root sample, found %d" % len(roots))
+    root = roots[0]
+    full = input_resistance(pidx, length, diameter, RM, RA, root)
+    area = np.pi * diameter * length
+    soma = (samples["type"] == 1) | (pidx < 0)
+    safe = np.where(pidx < 0, 0, pidx)
+    # electrotonic distance from the soma to the far end of each sample
+    electrotonic = length / length_constant(diameter, RM, RA)
+    distance = morphology.chain_sum(np.where(soma, 0.0, electrotonic), pidx, soma | soma[safe])
+    types = sorted(set(samples["type"][~soma].tolist()))
+    perType = max(1, (compartments - 1) // max(1, len(types)))
+    somaDiameter = np.sqrt(area[soma].sum() / np.pi)
+    names = ["soma"]
+    parent = [-1]
+    lengths = [somaDiameter]
+    diameters = [somaDiameter]
+    for swcType in types:
+        sel = (samples["type"] == swcType) & ~soma
+        end = distance[sel]
+        begin = end - electrotonic[sel]
+        span = np.maximum(end - begin, 1e-300)
+        width = end.max() / perType
+        prefix = TYPE_NAMES.get(swcType, "dend%d" % swcType)
+        for b in range(perType):
+            lo, hi = b * width, (b + 1) * width
+            overlap = np.clip(np.minimum(end, hi) - np.maximum(begin, lo), 0, None)
+            pieceArea = (area[sel] * overlap / span).sum()
+            if pieceArea <= 0:
+                break
+            # pi*d*L = area with L = width*sqrt(RM*d/(4*RA))
+            d = (pieceArea / (np.pi * width * np.sqrt(RM / (4 * RA)))) ** (2 / 3.0)
+            names.append("%s%d" % (prefix, b))
+            parent.append(0 if b == 0 else len(names) - 2)
+            lengths.append(width * length_constant(d, RM, RA))
+            diameters.append(d)
+    parent = np.array(parent, dtype=np.intp)
+    lengths = np.array(lengths)
+    diameters = np.array(diameters)
+    if match and len(names) > 1:
+        lo, hi = np.log(1e-3), np.log(1e3)
+        for i in range(60):
+            mid = (lo + hi) / 2
+            l, d = lengths.copy(), diameters.copy()
+            l[1:], d[1:] = _scale_axial(lengths[1:], diameters[1:], np.exp(mid))
+            # more axial resistance, less current into the dendrites
+            if input_resistance(parent, l, d, RM, RA) < full:
+                lo = mid
+            else:
+                hi = mid
+        lengths[1:], diameters[1:] = _scale_axial(lengths[1:], diameters[1:],
+                np.exp((lo + hi) / 2))
+    return ReducedCell(names, parent, lengths, diameters,
+            input_resistance(parent, lengths, diameters, RM, RA), full)
+
+def _direction(name):
+    for swcType, prefix in TYPE_NAMES.items():
+        if name.startswith(prefix):
+            return np.array(TYPE_DIRECTIONS[swcType])
+    return np.array((-1.0, 0.0, 0.0))
+
+def write_p(fileName, reduced, RM, RA, CM, Erest=EREST_ACT):
+    """Write a ReducedCell as a GENESIS cell parameter file, readable by
+    morphology.read_p and moose.loadModel. The soma is a sphere and each
+    chain of cylinders runs along its own axis."""
+    lines = ["// %s - equivalent cylinder reduction, %d compartments"
+                % (fileName, len(reduced.names)),
+            "// soma input resistance %.4g Mohm (full cell %.4g Mohm)"
+                % (reduced.inputResistance / 1e6, reduced.fullInputResistance / 1e6),
+            "",
+            "*relative",
+            "*cartesian",
+            "*asymmetric",
+            "",
+            "*set_global RM %.8g" % RM,
+            "*set_global RA %.8g" % RA,
+            "*set_global CM %.8g" % CM,
+            "*set_global EREST_ACT %.8g" % Erest,
+            ""]
+    for name, par, length, diameter in zip(reduced.names, reduced.parent,
+            reduced.length, reduced.diameter):
+        if par < 0:
+            xyz = np.zeros(3)
+        else:
+            xyz = _direction(name) * length * 1e6
+        lines.append("%s %s %.8g %.8g %.8g %.8g" % ((name,
+                "none" if par < 0 else reduced.names[par]) + tuple(xyz) + (diameter * 1e6,)))
+    with open(fileName, "w") as f:
+        f.write("\n".join(lines) + "\n")
@@ -0,0 +1,220 @@
+"""Event-driven spike delivery for hhsim networks.
+
+createSynapse gives every synapse the same 5 ms delay, and MOOSE checks
+each synapse's pending events every tick. Here each connection's delay
+is rounded to a whole number of steps, and a spike is written ahead
+into a ring buffer of per-neuron activations indexed by arrival step.
+A step therefore costs O(connections of the neurons that spiked)
+instead of O(synapses). TickScanQueue is the per-synapse polling
+scheme, kept for comparison (see compare_delivery).
+"""
+import time
+
+import numpy as np
+
+import network
+
+def random_delays(count, mean=5e-3, spread=2e-3, kind="uniform",
+        minimum=0.0, seed=None):
+    """Heterogeneous synaptic delays.
+
+    Parameters
+    ----------
+    count : int
+        number of delays to draw
+    mean, spread : float
+        centre and width (half-width for "uniform", standard deviation
+        for "normal" and "gamma") in seconds
+    kind : str
+        "uniform", "normal" or "gamma"
+    minimum : float
+        delays are clipped from below at this value
+    """
+    rng = np.random.RandomState(seed)
+    if kind == "uniform":
+        delays = rng.uniform(mean - spread, mean + spread, size=count)
+    elif kind == "normal":
+        delays = rng.normal(mean, spread, size=count)
+    elif kind == "gamma":
+        shape = (mean / spread) ** 2
+        delays = rng.gamma(shape, mean / shape, size=count)
+    else:
+        raise ValueError("unknown delay distribution %r" % (kind,))
+    return np.maximum(delays, minimum)
+
+class SpikeQueue(object):
+    """Ring buffer of pending synaptic input, one slot per step of delay.
+
+    Parameters
+    ----------
+    indptr, indices, weights, delays : numpy.ndarray
+        CSR connectivity, rows are presynaptic neurons
+    number : int
+        number of postsynaptic neurons
+    dt : float
+        timestep; delays are rounded to whole steps (at least one)
+    """
+    def __init__(self, indptr, indices, weights, delays, number, dt):
+        self.indptr = np.asarray(indptr, dtype=np.intp)
+        self.indices = np.asarray(indices, dtype=np.intp)
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.lag = np.maximum(1, np.rint(np.asarray(delays) / dt).astype(np.intp))
+        self.nslots = int(self.lag.max()) + 1 if len(self.lag) else 1
+        self.buffer = np.zeros((self.nslots, number))
+        self.step = 0
+
+    def push(self, spiking):
+        """Schedule the output of the neurons in `spiking` (indices),
+        which spiked during the step whose input pop() just returned;
+        a delay of L steps delivers it L pops later."""
+        if len(spiking) == 0:
+            return
+        starts = self.indptr[spiking]
+        counts = self.indptr[spiking + 1] - starts
+        total = counts.sum()
+        if total == 0:
+            return
+        # positions of all outgoing connections of the spiking neurons
+        offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        conn = np.repeat(starts, counts) + offsets
+        slots = (self.step - 1 + self.lag[conn]) % self.nslots
+        np.add.at(self.buffer, (slots, self.indices[conn]), self.weights[conn])
+
+    def pop(self):
+        """Summed weight arriving at each neuron this step; advances the
+        queue by one step."""
+        slot = self.step % self.nslots
+        arriving = self.buffer[slot].copy()
+        self.buffer[slot] = 0
+        self.step += 1
+        return arriving
+
+class TickScanQueue(object):
+    """Reference delivery that checks every synapse every step."""
+    def __init__(self, indptr, indices, weights, delays, number, dt):
+        self.pre = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+        self.indices = np.asarray(indices, dtype=np.intp)
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.lag = np.maximum(1, np.rint(np.asarray(delays) / dt).astype(np.intp))
+        self.number = number
+        self.due = np.full(len(self.indices), -1, dtype=np.intp)
+        self.fired = np.zeros(len(indptr) - 1, dtype=bool)
+        self.step = 0
+
+    def push(self, spiking):
+        self.fired[:] = False
+        self.fired[spiking] = True
+        hit = self.fired[self.pre]
+        self.due[hit] = self.step - 1 + self.lag[hit]
+
+    def pop(self):
+        arrive = self.due == self.step
+        arriving = np.bincount(self.indices[arrive],
+                weights=self.weights[arrive], minlength=self.number)
+        self.step += 1
+        return arriving
+
+class SpikingNetwork(object):
+    """hhsim compartments connected through a synaptic delivery queue.
+
+    Parameters
+    ----------
+    comps : hhsim.Compartments
+        one compartment per neuron
+    indptr, indices, weights, delays : numpy.ndarray
+        CSR connectivity, rows are presynaptic neurons
+    dt : float
+        integration timestep
+    Ek, gbar, tau1, tau2 : float
+        synaptic channel parameters, as in createSynapse
+    threshold, refractT : float
+        spike detection, as SpikeGen
+    queue : class
+        SpikeQueue or TickScanQueue
+    """
+    def __init__(self, comps, indptr, indices, weights, delays, dt,
+            Ek=0, gbar=1e-9, tau1=1e-3, tau2=5e-3,
+            threshold=0.0, refractT=1e-3, queue=SpikeQueue):
+        self.comps = comps
+        self.dt = dt
+        self.synchan = comps.add_synchan("syn", Ek, gbar, tau1, tau2)
+        self.queue = queue(indptr, indices, weights, delays, comps.number, dt)
+        self.threshold = threshold
+        self.refractSteps = int(round(refractT / dt))
+        self.lastSpike = np.full(comps.number, -self.refractSteps - 1)
+        self.above = np.zeros(comps.number, dtype=bool)
+
+    def reinit(self):
+        self.comps.reinit()
+        self.above = self.comps.Vm >= self.threshold
+
+    def run(self, simtime, stimulus=None):
+        """Integrate for `simtime`; returns (times, neurons) of every
+        spike, in order."""
+        comps = self.comps
+        queue = self.queue
+        times = []
+        neurons = []
+        for i in range(int(round(simtime / self.dt))):
+            t = i * self.dt
+            if stimulus is not None:
+                comps.inject[:] = stimulus(t)
+            self.synchan.activation += queue.pop()
+            comps.step(self.dt)
+            above = comps.Vm >= self.threshold
+            crossed = above & ~self.above
+            self.above = above
+            spiking = np.nonzero(crossed)[0]
+            if len(spiking):
+                spiking = spiking[i - self.lastSpike[spiking] > self.refractSteps]
+                self.lastSpike[spiking] = i
+                times.append(np.full(len(spiking), t + self.dt))
+                neurons.append(spiking)
+            queue.push(spiking)
+        if not times:
+            return np.empty(0), np.empty(0, dtype=np.intp)
+        return np.concatenate(times), np.concatenate(neurons)
+
+def compare_delivery(number=10000, probability=0.01, rate=20.0,
+        simtime=0.1, dt=1e-4, seed=0):
+    """Time SpikeQueue against TickScanQueue on random connectivity and
+    Poisson presynaptic activity, without any neuron model.
+
+    Returns
+    -------
+    timings : dict
+        seconds per simulated step for each queue, plus the number of
+        synapses
+    """
+    indptr, indices, weights, delays = network.random_connectivity(
+            number, probability, seed=seed)
+    delays = random_delays(len(indices), minimum=dt, seed=seed)
+    rng = np.random.RandomState(seed)
+    nsteps = int(round(simtime / dt))
+    # TickScanQueue keeps one pending spike per synapse, so neurons stay
+    # silent for longer than the longest delay after each spike
+    dead = int(np.ceil(delays.max() / dt)) + 1
+    lastFire = np.full(number, -dead)
+    fires = []
+    for i in range(nsteps):
+        spiking = np.nonzero((rng.random_sample(number) < rate * dt) &
+                (i - lastFire > dead))[0]
+        lastFire[spiking] = i
+        fires.append(spiking)
+    timings = {"synapses": len(indices)}
+    results = {}
+    for queue in (SpikeQueue, TickScanQueue):
+        q = queue(indptr, indices, weights, delays, number, dt)
+        total = np.zeros(number)
+        start = time.time()
+        for spiking in fires:
+            total += q.pop()
+            q.push(spiking)
+        timings[queue.__name__] = (time.time() - start) / nsteps
+        results[queue.__name__] = total
+    if not np.allclose(results["SpikeQueue"], results["TickScanQueue"]):
+        raise AssertionError("SpikeQueue and TickScanQueue delivered different input")
+    return timings
+
+if __name__ == '__main__':
+    print(compare_delivery())
@@ -0,0 +1,152 @@
+"""Spike detection and spike-train statistics on arrays of Vm traces.
+
+Traces are rows of a 2-D array (one trace may be passed as 1-D), for
+example Vm recorded by hhsim or read back with recording.load; memmaps
+are read in place, in column chunks, without loading the whole file.
+Spike trains of many traces are kept in one ragged (CSR-like) layout:
+the spikes of trace i are times[indptr[i]:indptr[i+1]].
+"""
+import collections
+
+import numpy as np
+
+SpikeTrains = collections.namedtuple("SpikeTrains", [
+    "indptr",   # trace i owns times[indptr[i]:indptr[i+1]]
+    "times"     # spike times (s), sorted within each trace
+    ])
+
+TrainStats = collections.namedtuple("TrainStats", [
+    "count",            # spikes per trace
+    "rate",             # spikes per second
+    "meanIsi",          # mean interspike interval (s), nan if < 2 spikes
+    "cv",               # coefficient of variation of the ISIs
+    "bursts",           # number of bursts per trace
+    "spikesPerBurst",   # mean spikes in a burst, nan if no bursts
+    "burstFraction"     # fraction of spikes that are part of a burst
+    ])
+
+def threshold_crossings(vm, threshold=0.0, chunk=1 << 20):
+    """Upward crossings of `threshold` in every trace.
+
+    Parameters
+    ----------
+    vm : numpy.ndarray
+        traces, shape (ntraces, nsamples) or (nsamples,)
+    chunk : int
+        number of samples per row examined at once, bounding the memory
+        of the temporary boolean arrays
+
+    Returns
+    -------
+    rows, cols : numpy.ndarray
+        trace and sample index of the first sample at or above
+        threshold of each crossing, sorted by row then sample
+    """
+    vm = np.asarray(vm)
+    if vm.ndim == 1:
+        vm = vm[np.newaxis, :]
+    rows = []
+    cols = []
+    for start in range(1, vm.shape[1], chunk):
+        stop = min(start + chunk, vm.shape[1])
+        prev = vm[:, start - 1:stop - 1] < threshold
+        up = prev & (vm[:, start:stop] >= threshold)
+        r, c = np.nonzero(up)
+        rows.append(r)
+        cols.append(c + start)
+    if not rows:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+    rows = np.concatenate(rows)
+    cols = np.concatenate(cols)
+    order = np.lexsort((cols, rows))
+    return rows[order], cols[order]
+
+def spike_trains(vm, dt, threshold=0.0, interpolate=True):
+    """Spike times of every trace.
+
+    With `interpolate` the crossing time is placed linearly between the
+    two samples around the threshold, instead of on the sample grid.
+
+    Returns
+    -------
+    trains : SpikeTrains
+    """
+    vm = np.asarray(vm)
+    if vm.ndim == 1:
+        vm = vm[np.newaxis, :]
+    rows, cols = threshold_crossings(vm, threshold)
+    times = cols * float(dt)
+    if interpolate and len(cols):
+        before = vm[rows, cols - 1]
+        after = vm[rows, cols]
+        times -= dt * (after - threshold) / (after - before)
+    indptr = np.r_[0, np.cumsum(np.bincount(rows, minlength=vm.shape[0]))]
+    return SpikeTrains(indptr, times)
+
+def isis(trains):
+    """Interspike intervals of every trace, in the same ragged layout.
+
+    Returns
+    -------
+    intervals : SpikeTrains
+        intervals of trace i are times[indptr[i]:indptr[i+1]]
+    """
+    indptr, times = trains
+    d = np.diff(times)
+    # drop the differences that straddle two traces
+    keep = np.ones(len(d), dtype=bool)
+    boundaries = indptr[1:-1] - 1
+    keep[boundaries[(boundaries >= 0) & (boundaries < len(d))]] = False
+    counts = np.maximum(np.diff(indptr) - 1, 0)
+    return SpikeTrains(np.r_[0, np.cumsum(counts)], d[keep])
+
+def _per_trace(indptr, values, power=1):
+    """Sum of values**power in every segment of a ragged array."""
+    rows = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+    return np.bincount(rows, weights=values ** power, minlength=len(indptr) - 1)
+
+def train_stats(trains, duration, burstIsi=10e-3, minBurst=3):
+    """Rate, ISI, CV and burst statistics of every trace.
+
+    Parameters
+    ----------
+    trains : SpikeTrains
+    duration : float
+        length of the recording (s), for the rate
+    burstIsi : float
+        spikes closer than this belong to the same burst
+    minBurst : int
+        minimum number of spikes in a burst
+
+    Returns
+    -------
+    stats : TrainStats
+    """
+    count = np.diff(trains.indptr)
+    intervals = isis(trains)
+    n = np.diff(intervals.indptr)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = _per_trace(intervals.indptr, intervals.times) / n
+        var = _per_trace(intervals.indptr, intervals.times, 2) / n - mean ** 2
+        cv = np.sqrt(np.maximum(var, 0)) / mean
+    # a burst is a run of at least minBurst - 1 short intervals in a row,
+    # runs being cut at trace boundaries
+    short = intervals.times < burstIsi
+    rows = np.repeat(np.arange(len(count)), n)
+    newRow = np.r_[True, rows[1:] != rows[:-1]][:len(rows)]
+    lastInRow = np.r_[newRow[1:], True][:len(rows)]
+    prevShort = np.r_[False, short[:-1]]
+    nextShort = np.r_[short[1:], False]
+    starts = np.nonzero(short & (~prevShort | newRow))[0]
+    stops = np.nonzero(short & (~nextShort | lastInRow))[0] + 1
+    runLength = stops - starts
+    isBurst = runLength >= minBurst - 1
+    burstRows = rows[starts[isBurst]]
+    bursts = np.bincount(burstRows, minlength=len(count))
+    inBursts = np.bincount(burstRows, weights=runLength[isBurst] + 1,
+            minlength=len(count))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        spikesPerBurst = np.where(bursts > 0, inBursts / bursts, np.nan)
+        burstFraction = np.where(count > 0, inBursts / count, np.nan)
+    return TrainStats(count, count / float(duration), mean, cv, bursts,
+            spikesPerBurst, burstFraction)
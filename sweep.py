@@ -0,0 +1,95 @@
+"""Parameter sweeps run across a process pool.
+
+Each point of the grid is built and run by a fresh worker process, so
+MOOSE models of different points never share an element tree, and the
+traces are written straight into one shared-memory results array.
+"""
+import itertools
+import multiprocessing
+
+import numpy as np
+
+def grid(*axes):
+    """Cartesian product of parameter axes.
+
+    Parameters
+    ----------
+    *axes : (str, sequence) pairs
+        parameter name and the values it takes
+
+    Returns
+    -------
+    points : list of dict
+        one {name: value} dict per grid point, last axis varying fastest
+    """
+    names = [name for name, values in axes]
+    return [dict(zip(names, values))
+            for values in itertools.product(*[values for name, values in axes])]
+
+#: Results array of the current worker process, set by _init_worker
+_results = None
+
+def _as_array(buf, shape):
+    return np.frombuffer(buf, dtype=np.float64).reshape(shape)
+
+def _init_worker(buf, shape):
+    global _results
+    _results = _as_array(buf, shape)
+
+def _run_point(task):
+    func, i, params = task
+    return i, _store(_results[i], func(**params))
+
+def _store(out, traces):
+    """Copy `traces` into the preallocated row `out`, truncating the
+    last axis if needed; returns the number of samples written."""
+    traces = np.asarray(traces, dtype=np.float64)
+    n = min(traces.shape[-1], out.shape[-1])
+    out[..., :n] = traces[..., :n]
+    return n
+
+def run_sweep(func, points, shape, processes=None):
+    """Call func(**point) for every point and collect the traces.
+
+    Parameters
+    ----------
+    func : callable
+        module-level function (it is pickled to the workers) that builds
+        a model for the given parameters, runs it and returns its traces
+        as an array whose shape fits in `shape`
+    points : list of dict
+        parameter sets, e.g. from grid()
+    shape : tuple of int
+        shape reserved for the traces of one point; the last axis is
+        time and shorter traces are padded with NaN
+    processes : int, optional
+        size of the pool (defaults to the CPU count); 0 runs every
+        point in this process instead
+
+    Returns
+    -------
+    results : numpy.ndarray
+        shape (len(points),) + shape
+    lengths : numpy.ndarray
+        number of samples written for each point
+    """
+    shape = (len(points),) + tuple(shape)
+    buf = multiprocessing.RawArray("d", int(np.prod(shape)))
+    results = _as_array(buf, shape)
+    results[...] = np.nan
+    lengths = np.zeros(len(points), dtype=np.intp)
+    if processes == 0:
+        for i, params in enumerate(points):
+            lengths[i] = _store(results[i], func(**params))
+        return results, lengths
+    tasks = [(func, i, params) for i, params in enumerate(points)]
+    # one task per child, so each model is built in a fresh process
+    pool = multiprocessing.Pool(processes, _init_worker, (buf, shape),
+            maxtasksperchild=1)
+    try:
+        for i, n in pool.imap_unordered(_run_point, tasks):
+            lengths[i] = n
+    finally:
+        pool.close()
+        pool.join()
+    return results, lengths
@@ -0,0 +1,96 @@
+import numpy as np
+
+from backends import moose
+
+# name is the name of this synapse type (e.g. "excitatory")
+# Ek is reversal potential?
+def createSynapse(comp, name, numInputs, Ek, gbar = 1e-9, tau1 = 1e-3, tau2 = 5e-3):
+    path = comp.path + "/" + name
+    if(moose.exists(path + "synchan")):
+        return moose.element(path + "synhandler")
+    synchan = moose.SynChan(path + "synchan")
+    synchan.Gbar = gbar
+    synchan.tau1 = tau1
+    synchan.tau2 = tau2
+    synchan.Ek = Ek
+    moose.connect(comp,"channel",synchan,"channel")
+    sh = moose.SimpleSynHandler(path + "synhandler")
+    moose.connect(sh, "activationOut", synchan, "activation")
+    sh.synapse.num = numInputs
+    for i in range(numInputs):
+        sh.synapse[i].delay = 5e-3
+    return sh
+
+def createRandSpike(path, rate):
+    spike = moose.RandSpike(path)
+    spike.rate = rate
+    spike.refractT = 1e-3
+    return spike
+
+# name is the name of this synapse type (e.g. "excitatory")
+def createRandomSynapse(comp, name, Ek = 0, rate = 300, numInputs = 1):
+    sh = createSynapse(comp, name, numInputs, Ek)
+    preSyns = []
+    for i in range(numInputs):
+        preSyns.append(createRandSpike(comp.path + "/" + name + "preSyn" + str(i), rate))
+        moose.connect(preSyns[i], "spikeOut", sh.synapse[i], "addSpike")
+    return sh, preSyns
+
+def poisson_trains(rate, simtime, numInputs=1, refractT=1e-3, seed=None):
+    """Spike times of `numInputs` independent inputs firing like
+    RandSpike: exponential intervals at `rate` after a dead time of
+    `refractT` following each spike.
+
+    Returns
+    -------
+    times : numpy.ndarray
+        all spike times, sorted
+    inputs : numpy.ndarray
+        index of the input that fired each spike
+    """
+    rng = np.random.RandomState(seed)
+    if rate <= 0 or numInputs == 0:
+        return np.empty(0), np.empty(0, dtype=np.intp)
+    meanIsi = refractT + 1.0 / rate
+    n = int(simtime / meanIsi * 1.2) + 10
+    isis = refractT + rng.exponential(1.0 / rate, size=(numInputs, n))
+    isis[:, 0] -= refractT # the first spike has no dead time before it
+    trains = np.cumsum(isis, axis=1)
+    while (trains[:, -1] < simtime).any():
+        more = refractT + rng.exponential(1.0 / rate, size=(numInputs, n))
+        trains = np.hstack((trains, trains[:, -1:] + np.cumsum(more, axis=1)))
+    inputs, cols = np.nonzero(trains < simtime)
+    times = trains[inputs, cols]
+    order = np.argsort(times, kind="mergesort")
+    return times[order], inputs[order]
+
+# name is the name of this synapse type (e.g. "excitatory")
+def createPoissonSynapse(comp, name, Ek = 0, rate = 300, numInputs = 1,
+        simtime = 1, refractT = 1e-3, seed = None, gbar = 1e-9, tau1 = 1e-3,
+        tau2 = 5e-3):
+    """Like createRandomSynapse, but the `numInputs` spike trains are
+    drawn up front and played into the synapse handler by TimeTables,
+    instead of RandSpike elements drawing a random number every step.
+
+    Returns
+    -------
+    sh : moose.SimpleSynHandler
+    times, inputs : numpy.ndarray
+        the presynaptic spike times and which input fired each, so no
+        spike table per input is needed to record them
+    """
+    sh = createSynapse(comp, name, numInputs, Ek, gbar, tau1, tau2)
+    times, inputs = poisson_trains(rate, simtime, numInputs, refractT, seed)
+    # A TimeTable sends at most one event per tick, so one table playing
+    # the merged train would hold back every spike that shares a step
+    # with another input's. Each input therefore gets its own table, as
+    # one vec; the spikes of one input are at least refractT apart, so
+    # none is delayed while refractT is no shorter than the clock dt.
+    tts = moose.vec(comp.path + "/" + name + "preSyns", n=numInputs, dtype="TimeTable")
+    order = np.argsort(inputs, kind="mergesort") # keeps each train sorted
+    bounds = np.searchsorted(inputs[order], np.arange(numInputs + 1))
+    for i in range(numInputs):
+        tts[i].vector = times[order[bounds[i]:bounds[i + 1]]]
+    # table i drives synapse i of the handler, all in one message
+    moose.connect(tts, "eventOut", sh.synapse, "addSpike", "OneToOne")
+    return sh, times, inputs
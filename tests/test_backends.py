@@ -0,0 +1,14 @@
+import json
+
+import backends
+
+def test_lazy_module_passes_every_attribute_through():
+    lazy = backends.LazyModule("json")
+    assert not backends.loaded(lazy)
+    # json has its own load, which the stand-in must not hide
+    assert lazy.load is json.load
+    assert backends.loaded(lazy)
+
+def test_available_is_false_for_a_missing_module():
+    assert backends.available(backends.LazyModule("json"))
+    assert not backends.available(backends.LazyModule("no_such_module_here"))
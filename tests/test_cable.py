@@ -0,0 +1,35 @@
+import numpy as np
+
+import cable
+
+def _dense(parent, g, diag):
+    """The matrix HinesSolver solves, built densely."""
+    A = np.diag(np.asarray(diag, dtype=np.float64))
+    for i, p in enumerate(parent):
+        if p >= 0:
+            A[i, i] += g[i]
+            A[p, p] += g[i]
+            A[i, p] -= g[i]
+            A[p, i] -= g[i]
+    return A
+
+def test_solve_matches_dense_solve_on_a_forest():
+    parent = np.array([-1, 0, 0, 1, 1, 3, -1, 6, 7, 7])
+    rng = np.random.RandomState(1)
+    g = rng.rand(len(parent))
+    diag = rng.rand(len(parent)) + 0.1
+    rhs = rng.rand(len(parent))
+    solver = cable.HinesSolver(parent, g)
+    expected = np.linalg.solve(_dense(parent, g, diag), rhs)
+    assert np.allclose(solver.solve(diag, rhs), expected)
+    # a second solve reuses the same work arrays
+    assert np.allclose(solver.solve(diag, 2 * rhs), 2 * expected)
+
+def test_solve_keeps_its_work_arrays():
+    parent = np.array([-1, 0, 1, 2, 1])
+    solver = cable.HinesSolver(parent, np.ones(5))
+    arrays = [solver.D, solver.R, solver.X, solver.V]
+    out = np.empty(5)
+    assert solver.solve(np.ones(5), np.ones(5), out) is out
+    assert solver.solve(np.ones(5), np.ones(5)) is solver.V
+    assert all(a is b for a, b in zip([solver.D, solver.R, solver.X, solver.V], arrays))
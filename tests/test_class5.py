@@ -0,0 +1,22 @@
+import os
+
+import numpy as np
+import pytest
+
+from backends import available, moose
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.mark.skipif(not available(moose), reason="moose is not installed")
+def test_class5_build_records_soma_and_dendrite(monkeypatch):
+    monkeypatch.chdir(HERE)
+    for path in ("/neuron", "/inputs", "/outputs", "/swcNeuron"):
+        if moose.exists(path):
+            moose.delete(path)
+    import class5
+    table, dtable = class5.build()
+    moose.reinit()
+    moose.start(30e-3)
+    assert len(table.vector) > 0
+    assert len(dtable.vector) == len(table.vector)
+    assert np.max(table.vector) > table.vector[0]
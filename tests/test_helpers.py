@@ -0,0 +1,251 @@
+import ast
+import os
+
+import matplotlib
+matplotlib.use("Agg")
+
+import numpy as np
+import pytest
+
+import channels
+import helpers
+import morphology
+import plotting
+from backends import available, moose, pyplot
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+needs_moose = pytest.mark.skipif(not available(moose), reason="moose is not installed")
+
+RM, RA, CM = 2.8, 4.0, 0.03
+
+class FakeTable(object):
+    """Enough of a moose.Table for the plotting helpers."""
+    def __init__(self, path, vector, dt=1e-4):
+        self.path = path
+        self.vector = np.asarray(vector, dtype=np.float64)
+        self.dt = dt
+        self.size = len(self.vector)
+
+@pytest.fixture
+def figure(monkeypatch):
+    shown = []
+    monkeypatch.setattr(plotting.plt, "show", lambda: shown.append(True))
+    pyplot.figure()
+    yield shown
+    pyplot.close("all")
+
+@pytest.fixture
+def root():
+    path = "/test_helpers"
+    if moose.exists(path):
+        moose.delete(path)
+    moose.Neutral(path)
+    yield path
+    moose.delete(path)
+
+def _run(duration, dt=25e-6):
+    for i in range(10):
+        moose.setClock(i, dt)
+    moose.reinit()
+    moose.start(duration)
+
+def test_plot_table_draws_one_line_without_showing(figure):
+    lines = helpers.plot_table(FakeTable("/vm", np.arange(10.0)))
+    assert len(lines) == 1
+    assert np.array_equal(lines[0].get_ydata(), np.arange(10.0))
+    assert figure == []
+
+def test_plot_tables_draws_every_table(figure):
+    tables = [FakeTable("/a", np.zeros(20)), FakeTable("/b", np.ones(20)),
+            FakeTable("/c", np.ones(5), dt=1e-3)]
+    lines = helpers.plot_tables(tables, show=True)
+    assert sorted(line.get_label() for line in lines) == ["/a", "/b", "/c"]
+    assert figure == [True]
+
+def test_plot_spike_tables_puts_each_table_on_its_row(figure):
+    lines = helpers.plot_spike_tables([FakeTable("/s0", [0.1, 0.2]),
+            FakeTable("/s1", [0.15])])
+    assert np.array_equal(lines[0].get_ydata(), [0, 0])
+    assert np.array_equal(lines[1].get_ydata(), [1])
+    assert [line.get_label() for line in lines] == ["/s0", "/s1"]
+    assert figure == []
+
+def test_plot_tables_clear_empties_the_figure(figure):
+    helpers.plot_table(FakeTable("/a", np.zeros(20)))
+    helpers.plot_table(FakeTable("/b", np.ones(20)))
+    assert len(pyplot.gca().lines) == 2
+    helpers.plot_tables([FakeTable("/c", np.ones(20))], clear=True)
+    assert [line.get_label() for line in pyplot.gca().lines] == ["/c"]
+
+def test_plotting_and_helpers_share_the_show_default(figure):
+    plotting.plot_tables([FakeTable("/a", np.zeros(20))])
+    plotting.plot_spike_tables([FakeTable("/s", [0.1])])
+    assert figure == []
+
+SETTINGS = [channels.Na_settings, channels.K_settings, channels.KDr_settings,
+        channels.SK_settings, channels.CaL_settings]
+
+#: Scripts that take their channel constants from channels.py
+SCRIPTS = ["class7", "class8", "class9", "class10", "hw7", "hw9"]
+
+@pytest.mark.parametrize("settings", SETTINGS, ids=lambda s: s.name)
+def test_channel_settings_have_a_param_for_every_gate(settings):
+    assert isinstance(settings, channels.ChannelSettings)
+    assert isinstance(settings.name, str)
+    assert settings.chan_type in ("", "ca_permeable", "ca_dependent")
+    for power, param, kind in ((settings.xPower, settings.xParam, channels.AbParams),
+            (settings.yPower, settings.yParam, channels.AbParams),
+            (settings.zPower, settings.zParam, channels.CaDepParams)):
+        assert (power > 0) == isinstance(param, kind)
+
+@pytest.mark.parametrize("settings", SETTINGS, ids=lambda s: s.name)
+def test_gate_tables_are_finite(settings, tmp_path, monkeypatch):
+    monkeypatch.setattr(channels.cache, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(channels, "_tables", {})
+    tables = channels.gate_tables(settings)
+    assert sorted(tables) == [gate for gate, power in zip("XYZ",
+            (settings.xPower, settings.yPower, settings.zPower)) if power > 0]
+    for tableA, tableB in tables.values():
+        assert np.all(np.isfinite(tableA)) and np.all(np.isfinite(tableB))
+
+def test_ca_pool_settings():
+    pool = channels.Ca_pool_settings
+    assert isinstance(pool, channels.PoolSettings)
+    assert pool.CaThick > 0 and pool.CaTau > 0 and pool.BufCapacity > 0
+
+@pytest.mark.parametrize("script", SCRIPTS)
+def test_script_does_not_redefine_channel_types(script):
+    with open(os.path.join(HERE, script + ".py")) as f:
+        tree = ast.parse(f.read())
+    assigned = set(target.id for node in tree.body if isinstance(node, ast.Assign)
+            for target in node.targets if isinstance(target, ast.Name))
+    assert not assigned & set(["AbParams", "CaDepParams", "ChannelSettings",
+            "PoolSettings", "EREST_ACT", "Ca_pool_settings", "K_settings"])
+
+@needs_moose
+def test_create_pulse_keeps_second_level(root):
+    comp = helpers.create_spherical_compartment(root + "/s", 20e-6, 20e-6, RM, RA, CM)
+    pulse = helpers.create_pulse(root + "/pulse", 5e-3, 10e-3, 1e-10, comp,
+            secondlevel=1e-9)
+    assert np.isclose(pulse.level[1], 1e-9)
+    assert np.isclose(pulse.delay[1], 1e9)
+
+@needs_moose
+def test_create_compartment_sets_passive_properties(root):
+    comp = helpers.create_compartment(root + "/c", 20e-6, 2e-6, 1e-10, 3e-12,
+            RM, RA, CM, Em=-65e-3)
+    assert np.isclose(comp.Rm, RM / 1e-10)
+    assert np.isclose(comp.Cm, CM * 1e-10)
+    assert np.isclose(comp.Ra, RA * 20e-6 / 3e-12)
+    assert np.isclose(comp.Em, -65e-3)
+
+@needs_moose
+def test_create_spherical_compartment_uses_sphere_area(root):
+    comp = helpers.create_spherical_compartment(root + "/s", 20e-6, 20e-6, RM, RA, CM)
+    assert np.isclose(comp.Rm, RM / (np.pi * 20e-6 ** 2))
+    assert np.isclose(comp.Cm, CM * np.pi * 20e-6 ** 2)
+
+@needs_moose
+def test_create_pulse_and_table_record_depolarization(root):
+    comp = helpers.create_spherical_compartment(root + "/s", 20e-6, 20e-6,
+            RM, RA, CM, Em=-65e-3, initVm=-65e-3)
+    helpers.create_pulse(root + "/pulse", 5e-3, 10e-3, 1e-10, comp)
+    tab = helpers.create_table(root + "/vm", comp, "getVm")
+    _run(20e-3)
+    vm = np.asarray(tab.vector)
+    t = np.arange(len(vm)) * tab.dt
+    assert np.allclose(vm[t < 4e-3], -65e-3)
+    assert vm[(t > 10e-3) & (t < 15e-3)].min() > -60e-3
+
+@needs_moose
+def test_create_tables_records_each_compartment(root):
+    comps = moose.vec(root + "/vec", n=3, dtype="Compartment")
+    comps.initVm = [-0.07, -0.06, -0.05]
+    comps.Em = comps.initVm
+    comps.Rm = 1e9
+    comps.Cm = 1e-11
+    tabs = helpers.create_tables(root + "/tabs", comps, "getVm")
+    _run(1e-3)
+    assert len(tabs) == 3
+    assert np.allclose([tab.vector[-1] for tab in tabs], [-0.07, -0.06, -0.05])
+
+@needs_moose
+def test_create_spike_table_records_spikes(root):
+    spike = moose.SpikeGen(root + "/spike")
+    spike.threshold = 0.5
+    pulse = moose.PulseGen(root + "/source")
+    pulse.delay[0] = 1e-3
+    pulse.width[0] = 1e-4
+    pulse.level[0] = 1.0
+    pulse.delay[1] = 1e9
+    moose.connect(pulse, "output", spike, "Vm")
+    tab = helpers.create_spike_table(root + "/spikes", spike)
+    _run(5e-3)
+    assert len(tab.vector) == 1
+    assert np.isclose(tab.vector[0], 1e-3, atol=1e-4)
+
+@needs_moose
+def test_create_channel_proto_is_built_once():
+    chan = helpers.create_channel_proto(channels.Na_settings)
+    assert chan.Xpower == channels.Na_settings.xPower
+    assert chan.Ypower == channels.Na_settings.yPower
+    assert helpers.create_channel_proto(channels.Na_settings).path == chan.path
+
+@needs_moose
+def test_create_ca_pool_proto_is_built_once():
+    pool = helpers.create_ca_pool_proto(channels.Ca_pool_settings)
+    assert np.isclose(pool.tau, channels.Ca_pool_settings.CaTau)
+    assert np.isclose(pool.thick, channels.Ca_pool_settings.CaThick)
+    assert helpers.create_ca_pool_proto(channels.Ca_pool_settings).path == pool.path
+
+@needs_moose
+def test_create_ca_pools_one_per_compartment(root):
+    comps = moose.vec(root + "/vec", n=4, dtype="Compartment")
+    comps.length = 50e-6
+    comps.diameter = 30e-6
+    pools = helpers.create_ca_pools(comps, channels.Ca_pool_settings)
+    assert len(pools) == 4
+    vol = np.pi * 50e-6 * 30e-6 * channels.Ca_pool_settings.CaThick
+    B = 1 / (helpers.FARADAY * vol * 2) / channels.Ca_pool_settings.BufCapacity
+    assert np.allclose(pools.B, B)
+    assert helpers.create_ca_pools(comps, channels.Ca_pool_settings).path == pools.path
+
+@needs_moose
+def test_add_calcium_rejects_unknown_type(root):
+    comps = moose.vec(root + "/vec", n=2, dtype="Compartment")
+    with pytest.raises(ValueError):
+        helpers.add_calcium(comps, channels.Ca_pool_settings, comps, "neither")
+
+@needs_moose
+def test_addChannelToComps_covers_every_compartment(root):
+    comps = moose.vec(root + "/vec", n=5, dtype="Compartment")
+    comps.length = 50e-6
+    comps.diameter = 30e-6
+    cal = helpers.addChannelToComps({"settings": channels.CaL_settings,
+            "gbar": 2.0, "Ek": 0.13}, comps, len(comps))
+    assert len(cal) == 5
+    assert np.allclose(cal.Gbar, 2.0 * np.pi * 50e-6 * 30e-6)
+    pools = moose.vec("%s/%s_vec" % (root, channels.Ca_pool_settings.name))
+    assert len(pools) == 5
+    assert len(cal[0].neighbors["IkOut"]) == 1
+
+@needs_moose
+def test_load_genesis_file_reads_every_compartment(root):
+    helpers.load_genesis_file(os.path.join(HERE, "layer2.p"), root + "/cell")
+    names = set(c.name for c in moose.wildcardFind(root + "/cell/##[ISA=CompartmentBase]"))
+    assert names == set(["soma", "apical0", "apical1", "apical2", "apical3",
+            "basal0", "basal1", "basal2"])
+
+@needs_moose
+def test_load_neuron_file_builds_one_vec(root):
+    fileName = os.path.join(HERE, "538ser3sl5-cell1-2-a.CNG.swc")
+    comps = helpers.load_neuron_file(fileName, root + "/cell", RM, RA, CM, initVm=-65e-3)
+    samples = morphology.read_swc(fileName)
+    assert len(comps) == len(samples)
+    length, diameter = morphology.compartment_geometry(samples)
+    assert np.allclose(np.asarray(comps.Rm) * np.pi * diameter * length, RM)
+    assert np.allclose(comps.initVm, -65e-3)
+    # the root has no parent, every other compartment has one
+    assert len(comps[0].neighbors["raxial"]) == 0
+    assert len(comps[1].neighbors["raxial"]) == 1
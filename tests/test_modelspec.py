@@ -0,0 +1,51 @@
+import os
+
+import numpy as np
+import pytest
+
+import cache
+import modelspec
+from backends import available, moose
+
+SPEC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        "hh_1comp.json")
+
+def test_compiled_spec_is_reused_from_the_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_DIR", str(tmp_path))
+    modelspec.forget()
+    model = modelspec.load(SPEC)
+    # a new process only has the cache directory
+    modelspec.forget()
+    calls = []
+    monkeypatch.setattr(modelspec, "_compile", lambda *args: calls.append(args))
+    assert modelspec.load(SPEC) == model
+    assert calls == []
+
+def test_cached_engine_runs_like_a_fresh_build(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_DIR", str(tmp_path))
+    modelspec.forget()
+    model = modelspec.load(SPEC)
+    fresh = modelspec._build_engine(model, 2)
+    modelspec.build_engine(model, 2)
+    assert any(name.startswith("engine-") for name in os.listdir(str(tmp_path)))
+    modelspec.forget()
+    cached = modelspec.build_engine(model, 2)
+    for comps in (fresh, cached):
+        comps.reinit()
+        comps.run(0.01, 0.25e-4, plotdt=0.01)
+    assert np.array_equal(fresh.Vm, cached.Vm)
+
+@pytest.mark.skipif(not available(moose), reason="moose is not installed")
+def test_build_moose_replaces_the_whole_model(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_DIR", str(tmp_path))
+    model = modelspec.load(SPEC)
+    path = "/test_modelspec"
+    modelspec.build_moose(model, path, number=3)
+    before = set(child.name for child in moose.element(path).children)
+    comps = modelspec.build_moose(model, path, number=2)
+    assert len(comps) == 2
+    children = moose.element(path).children
+    assert set(child.name for child in children) == before
+    # every sibling vec was rebuilt for the new size
+    assert all(len(child) == 2 for child in children)
+    moose.delete(path)
@@ -0,0 +1,51 @@
+import os
+
+import numpy as np
+
+import cells
+import morphology
+
+HERE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_passive_properties_treats_zero_length_as_sphere():
+    Rm, Cm, Ra = morphology.passive_properties([0.0, 10e-6], [20e-6, 2e-6], 2.8, 4.0, 0.03)
+    sphere = np.pi * 20e-6 ** 2
+    assert np.isclose(Rm[0], 2.8 / sphere)
+    assert np.isclose(Cm[0], 0.03 * sphere)
+    assert np.all(np.isfinite(Ra))
+
+SWC = b"""# two samples
+1 1 0 0 0 5 -1
+2 3 0 10 0 1 1
+"""
+
+def test_read_swc_is_read_only_on_miss_and_hit(tmp_path, monkeypatch):
+    monkeypatch.setattr(morphology.cache, "CACHE_DIR", str(tmp_path / "cache"))
+    fileName = tmp_path / "cell.swc"
+    fileName.write_bytes(SWC)
+    first = morphology.read_swc(str(fileName))
+    second = morphology.read_swc(str(fileName))
+    assert not first.flags.writeable
+    assert not second.flags.writeable
+    assert np.array_equal(first, second)
+    assert morphology.read_swc(str(fileName), use_cache=False).flags.writeable
+
+BRANCHED = b"""# soma, a dendrite that forks, and an axon
+1 1 0 0 0 5 -1
+2 3 0 10 0 1 1
+3 3 0 20 0 1 2
+4 3 5 25 0 1 3
+5 3 -5 25 0 1 3
+6 2 0 -10 0 1 1
+"""
+
+def test_compartment_names_follow_branches():
+    samples = morphology.parse_swc(BRANCHED)
+    assert morphology.compartment_names(samples) == ["soma", "dend_0_0",
+            "dend_0_1", "dend_1_0", "dend_2_0", "axon_3_0"]
+
+def test_neuron_file_index_finds_class5_compartments():
+    index = cells.neuron_file_index(os.path.join(HERE, "538ser3sl5-cell1-2-a.CNG.swc"))
+    assert index["soma"] == 0
+    assert "dend_3_0" in index
+    assert len(set(index.values())) == len(index)
@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+import network
+from backends import available, moose
+
+def test_synapse_slots_number_each_handlers_synapses():
+    indptr, indices, weights, delays = network.random_connectivity(50, 0.2, seed=4)
+    pre, slot, counts = network.synapse_slots(indptr, indices, 50)
+    assert np.array_equal(counts, np.bincount(indices, minlength=50))
+    assert (pre != indices).all()
+    for post in range(50):
+        assert sorted(slot[indices == post].tolist()) == list(range(counts[post]))
+
+@pytest.mark.skipif(not available(moose), reason="moose is not installed")
+def test_connect_network_sets_weights_and_delays_per_synapse():
+    path = "/test_network"
+    if moose.exists(path):
+        moose.delete(path)
+    moose.Neutral(path)
+    comps = moose.vec(path + "/comp", n=20, dtype="Compartment")
+    indptr, indices, weights, delays = network.random_connectivity(20, 0.3,
+            delay=5e-3, delaySpread=2e-3, seed=1)
+    weights = np.arange(len(indices), dtype=np.float64)
+    net = network.connect_network(comps, indptr, indices, weights, delays)
+    pre, slot, counts = network.synapse_slots(indptr, indices, 20)
+    for k in range(len(indices)):
+        syn = moose.element("%s[%d]/synapse[%d]" % (net.handlers.path,
+                indices[k], slot[k]))
+        assert syn.weight == weights[k]
+        assert np.isclose(syn.delay, delays[k])
+    moose.delete(path)
@@ -0,0 +1,28 @@
+import numpy as np
+
+import plotting
+
+def test_pyramid_rebuilt_when_trace_changes_between_sampled_points():
+    values = np.ones(100000)
+    key = ("/data/vm", 1e-5, len(values))
+    first = plotting.pyramid(values, key)
+    assert first.levels[-1][1].max() == 1.0
+    changed = values.copy()
+    changed[100] = 50.0
+    second = plotting.pyramid(changed, key)
+    assert second is not first
+    assert second.levels[-1][1].max() == 50.0
+
+def test_pyramid_reused_for_same_contents():
+    values = np.sin(np.linspace(0, 10, 5000))
+    key = ("/data/same", 1e-5, len(values))
+    assert plotting.pyramid(values, key) is plotting.pyramid(values.copy(), key)
+
+def test_pyramid_cache_is_bounded_and_owns_its_traces(monkeypatch):
+    monkeypatch.setattr(plotting, "_pyramids", plotting.collections.OrderedDict())
+    traces = np.random.RandomState(0).rand(plotting.PYRAMID_CACHE_SIZE + 4, 2000)
+    for i, row in enumerate(traces):
+        pyr = plotting.pyramid(row, ("/data/vm%d" % i, 1e-5, len(row)))
+        assert not np.shares_memory(pyr.levels[0][0], traces)
+    assert len(plotting._pyramids) == plotting.PYRAMID_CACHE_SIZE
+    assert ("/data/vm0", 1e-5, 2000) not in plotting._pyramids
@@ -0,0 +1,57 @@
+import types
+
+import profiling
+
+def _work(n):
+    return sum(i * i for i in range(n))
+
+def test_phase_profile_covers_every_call():
+    profiler = profiling.Profiler("test", cprofile=True)
+    for i in range(3):
+        with profiler.phase("work"):
+            _work(1000)
+    entry = profiler.report()["phases"][0]
+    assert entry["calls"] == 3
+    calls = [row["calls"] for row in entry["profile"] if row["function"].endswith("(_work)")]
+    assert calls == [3]
+
+def test_instrument_times_calls_and_restores():
+    module = types.ModuleType("fake")
+    module.work = _work
+    profiler = profiling.Profiler("test")
+    restore = profiling.instrument(module, ["work"], profiler)
+    module.work(10)
+    restore()
+    module.work(10)
+    assert module.work is _work
+    assert profiler.phases["work"]["calls"] == 1
+
+def test_instrumented_restores_on_error():
+    module = types.ModuleType("fake")
+    module.work = _work
+    profiler = profiling.Profiler("test")
+    try:
+        with profiling.instrumented(module, ["work"], profiler):
+            module.work(10)
+            raise RuntimeError
+    except RuntimeError:
+        pass
+    assert module.work is _work
+    assert profiler.phases["work"]["calls"] == 1
+
+def test_nested_phases_report_exclusive_time(monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr(profiling.time, "time", lambda: clock[0])
+    profiler = profiling.Profiler("test")
+    with profiler.phase("build"):
+        clock[0] += 1.0
+        with profiler.phase("add_calcium"):
+            clock[0] += 2.0
+            with profiler.phase("add_calcium"):
+                clock[0] += 4.0
+    phases = profiler.phases
+    assert phases["build"]["wall"] == 7.0
+    assert phases["build"]["exclusive"] == 1.0
+    assert phases["add_calcium"]["wall"] == 6.0
+    assert phases["add_calcium"]["exclusive"] == 6.0
+    assert phases["add_calcium"]["calls"] == 2
@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+import synapses
+from backends import available, moose
+
+needs_moose = pytest.mark.skipif(not available(moose), reason="moose is not installed")
+
+def test_poisson_trains_keep_refractory_time_per_input():
+    times, inputs = synapses.poisson_trains(200, 2.0, numInputs=5, refractT=2e-3, seed=3)
+    assert (np.diff(times) >= 0).all()
+    for i in range(5):
+        train = times[inputs == i]
+        assert len(train) > 0
+        assert np.diff(train).min() >= 2e-3
+
+@needs_moose
+def test_createPoissonSynapse_plays_each_input_on_its_own_table():
+    path = "/test_synapses"
+    if moose.exists(path):
+        moose.delete(path)
+    moose.Neutral(path)
+    comp = moose.Compartment(path + "/comp")
+    sh, times, inputs = synapses.createPoissonSynapse(comp, "exc", rate=100,
+            numInputs=3, simtime=0.5, seed=1)
+    tts = moose.vec(comp.path + "/excpreSyns")
+    assert len(tts) == 3
+    assert sh.synapse.num == 3
+    for i in range(3):
+        assert np.array_equal(tts[i].vector, times[inputs == i])
+    moose.delete(path)